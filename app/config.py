@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import computed_field
 from functools import lru_cache
+from typing import Optional
 
 
 class Settings(BaseSettings):
@@ -28,6 +29,36 @@ class Settings(BaseSettings):
     redis_url: str
     inference_api_url: str
 
+    analysis_soft_ttl_days: int = 30
+    analysis_hard_ttl_days: int = 90
+    analysis_refresh_lock_seconds: int = 600
+    analysis_local_cache_size: int = 512
+    analysis_local_cache_ttl_seconds: int = 600
+    batch_analysis_concurrency: int = 5
+    batch_analysis_max_urls: int = 500
+    review_retention_per_place: int = 50
+    review_max_age_days: int = 0
+    gemini_result_cache_ttl_days: int = 120
+    photo_cache_dir: str = "photo_cache"
+    photo_cache_max_mb: int = 512
+    photo_cache_ttl_days: int = 30
+    gemini_batch_size: int = 5
+    gemini_review_token_budget: int = 4000
+    llm_requests_per_minute: int = 60
+    llm_burst: int = 10
+    llm_max_concurrency: int = 8
+    llm_max_retries: int = 3
+    llm_backend: str = "gemini"
+    fake_llm_latency_ms: int = 800
+    fake_llm_latency_sigma: float = 0.5
+    fake_llm_error_rate: float = 0.0
+    fake_llm_throttle_rate: float = 0.0
+    fake_llm_seed: Optional[int] = None
+    serpapi_cache_enabled: bool = True
+    nearby_search_tile_deg: float = 0.005
+    place_url_local_cache_size: int = 4096
+    analysis_refresh_places_per_run: int = 20
+
     @computed_field
     @property
     def db_url(self) -> str:
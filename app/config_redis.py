@@ -6,3 +6,6 @@ settings = get_settings()
 redis_pool = redis.ConnectionPool.from_url(
     settings.redis_url, encoding="utf-8", decode_responses=True
 )
+
+# Пул без decode_responses для бинарных значений (см. modules/common/cache_codec.py)
+redis_binary_pool = redis.ConnectionPool.from_url(settings.redis_url)
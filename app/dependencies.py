@@ -8,7 +8,7 @@ from . import security
 from .modules.user.schemas import TokenData
 from .modules.user.models import User
 from .database import AsyncLocalSession
-from .config_redis import redis_pool
+from .config_redis import redis_pool, redis_binary_pool
 
 
 async def get_db():
@@ -16,10 +16,18 @@ async def get_db():
         yield session
 
 
+def get_session_factory():
+    return AsyncLocalSession
+
+
 def get_redis_client():
     return redis.Redis(connection_pool=redis_pool)
 
 
+def get_redis_binary_client():
+    return redis.Redis(connection_pool=redis_binary_pool)
+
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/token")
 
 
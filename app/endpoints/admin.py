@@ -14,6 +14,7 @@ from datetime import datetime, timedelta
 from ..modules.user.models import UserLog, ActionType
 from ..modules.analysis_result.models import AnalysisResult
 from ..modules.place.models import Place
+from ..model_service.llm_gateway import llm_gateway
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -37,6 +38,12 @@ async def clear_logs():
     return await AdminService.clear_logs_cache()
 
 
+@router.get("/llm/metrics")
+async def get_llm_metrics():
+    """Очередь и ожидание LLM-gateway этого процесса API."""
+    return llm_gateway.metrics()
+
+
 @router.get("/users", response_model=List[UserOut])
 async def get_all_users(db: AsyncSession = Depends(get_db)):
 
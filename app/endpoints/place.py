@@ -1,14 +1,23 @@
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from ..modules.user.models import User
 from ..modules.analysis_result.schemas import (
     AIResponseIn,
     CompareRequest,
     CompareResponse,
     AIResponseOut,
+    BatchAnalyzeRequest,
 )
-from ..dependencies import get_current_user, get_db
-from ..services.service_analyzator import get_or_create_place_analysis
+from ..config import get_settings
+from ..dependencies import get_current_user, get_db, get_session_factory
+from ..services.service_analyzator import (
+    get_or_create_place_analysis,
+    stream_place_analysis,
+)
+from ..services.service_batch import stream_batch_place_analysis
+from ..services.service_jobs import submit_analysis_job, get_analysis_job
+from ..modules.parsing.schemas import AnalysisJobOut
 from ..services.service_comparator import compare_places_service
 from ..modules.pro_mode.schemas import FinalResponse, UserRequest
 from ..modules.pro_mode.main import get_places_by_vibe
@@ -18,6 +27,8 @@ from app.modules.user.models import ActionType
 from ..modules.favorites.service import FavoritesService
 from ..modules.parsing.pro_mode_parser import find_places_nearby
 
+settings = get_settings()
+
 router = APIRouter()
 
 
@@ -44,6 +55,97 @@ async def get_place_analysis(
     return result
 
 
+@router.post("/analyze/stream", status_code=status.HTTP_200_OK)
+async def stream_place_analysis_events(
+    place: AIResponseIn,
+    user_auth: User = Depends(get_current_user),
+    session_factory: async_sessionmaker = Depends(get_session_factory),
+):
+    """
+    Server-Sent Events: place_info as soon as the place is parsed,
+    then one field event per analysis field, then the full result.
+    """
+    return StreamingResponse(
+        stream_place_analysis(
+            url=place.url, limit=place.limit, session_factory=session_factory
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/analyze/jobs",
+    response_model=AnalysisJobOut,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def create_place_analysis_job(
+    place: AIResponseIn,
+    response: Response,
+    user_auth: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Queues the analysis in Celery and returns immediately with a job id.
+    Poll GET /place/analyze/jobs/{job_id} for the result.
+    If a fresh analysis already exists, returns it with 200 and no job id.
+    """
+    job = await submit_analysis_job(
+        url=place.url, limit=place.limit, user_id=user_auth.id, db=db
+    )
+    if job.result is not None:
+        response.status_code = status.HTTP_200_OK
+    return job
+
+
+@router.get(
+    "/analyze/jobs/{job_id}",
+    response_model=AnalysisJobOut,
+    status_code=status.HTTP_200_OK,
+)
+async def get_place_analysis_job(
+    job_id: int,
+    user_auth: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    return await get_analysis_job(job_id=job_id, user_id=user_auth.id, db=db)
+
+
+@router.post("/analyze/batch", status_code=status.HTTP_200_OK)
+async def get_batch_place_analysis(
+    places: BatchAnalyzeRequest,
+    user_auth: User = Depends(get_current_user),
+    session_factory: async_sessionmaker = Depends(get_session_factory),
+):
+    """
+    Streams one NDJSON line per place as soon as its analysis is ready.
+    Errors are reported inline and do not stop the rest of the batch.
+    """
+    if not places.urls:
+        raise HTTPException(status_code=400, detail="Список ссылок пуст")
+
+    if len(places.urls) > settings.batch_analysis_max_urls:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Максимум {settings.batch_analysis_max_urls} ссылок за раз",
+        )
+
+    concurrency = min(
+        places.concurrency or settings.batch_analysis_concurrency,
+        settings.batch_analysis_concurrency,
+    )
+
+    return StreamingResponse(
+        stream_batch_place_analysis(
+            urls=places.urls,
+            limit=places.limit,
+            concurrency=max(concurrency, 1),
+            session_factory=session_factory,
+        ),
+        media_type="application/x-ndjson",
+    )
+
+
 @router.post("/compare", response_model=CompareResponse, status_code=status.HTTP_200_OK)
 async def compare_places(
     places: CompareRequest,
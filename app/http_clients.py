@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from typing import Optional
+
+import aiohttp
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# SerpApi: много параллельных запросов из pro mode и батчей
+SERPAPI_CONNECTION_LIMIT = 50
+SERPAPI_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=5)
+
+# Короткие ссылки (goo.gl, maps.app.goo.gl) — только HEAD с редиректами
+WEB_CONNECTION_LIMIT = 20
+WEB_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=5)
+
+# Внутренний inference-сервис (эмбеддинги, реранк)
+INFERENCE_LIMITS = httpx.Limits(
+    max_connections=20, max_keepalive_connections=10, keepalive_expiry=60
+)
+INFERENCE_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+# Фото мест: CDN Google поддерживает HTTP/2, все фото идут по одному соединению
+IMAGES_LIMITS = httpx.Limits(
+    max_connections=20, max_keepalive_connections=10, keepalive_expiry=60
+)
+IMAGES_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+KEEPALIVE_SECONDS = 60
+DNS_CACHE_SECONDS = 300
+
+
+class HttpClients:
+    """
+    Реестр долгоживущих HTTP-клиентов для внешних провайдеров.
+
+    Клиенты создаются один раз (lifespan FastAPI / старт Celery-воркера)
+    и переиспользуют соединения, чтобы не платить за DNS+TCP+TLS на каждый вызов.
+    Клиенты привязаны к event loop: если loop сменился, они пересоздаются.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._serpapi: Optional[aiohttp.ClientSession] = None
+        self._web: Optional[aiohttp.ClientSession] = None
+        self._inference: Optional[httpx.AsyncClient] = None
+        self._images: Optional[httpx.AsyncClient] = None
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+
+        if self._loop is not None:
+            logger.warning("[HTTP] Event loop changed, recreating HTTP clients")
+
+        self._loop = loop
+        self._serpapi = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=SERPAPI_CONNECTION_LIMIT,
+                keepalive_timeout=KEEPALIVE_SECONDS,
+                ttl_dns_cache=DNS_CACHE_SECONDS,
+            ),
+            timeout=SERPAPI_TIMEOUT,
+        )
+        self._web = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=WEB_CONNECTION_LIMIT,
+                keepalive_timeout=KEEPALIVE_SECONDS,
+                ttl_dns_cache=DNS_CACHE_SECONDS,
+            ),
+            timeout=WEB_TIMEOUT,
+        )
+        self._inference = httpx.AsyncClient(
+            limits=INFERENCE_LIMITS, timeout=INFERENCE_TIMEOUT
+        )
+        self._images = httpx.AsyncClient(
+            limits=IMAGES_LIMITS,
+            timeout=IMAGES_TIMEOUT,
+            http2=True,
+            follow_redirects=True,
+        )
+
+    async def start(self):
+        self._ensure_started()
+        logger.info("[HTTP] Shared HTTP clients started")
+
+    async def close(self):
+        if self._loop is None:
+            return
+
+        for session in (self._serpapi, self._web):
+            await session.close()
+        for client in (self._inference, self._images):
+            await client.aclose()
+
+        self._loop = None
+        logger.info("[HTTP] Shared HTTP clients closed")
+
+    @property
+    def serpapi(self) -> aiohttp.ClientSession:
+        self._ensure_started()
+        return self._serpapi
+
+    @property
+    def web(self) -> aiohttp.ClientSession:
+        self._ensure_started()
+        return self._web
+
+    @property
+    def inference(self) -> httpx.AsyncClient:
+        self._ensure_started()
+        return self._inference
+
+    @property
+    def images(self) -> httpx.AsyncClient:
+        self._ensure_started()
+        return self._images
+
+
+http_clients = HttpClients()
@@ -1,10 +1,11 @@
+import asyncio
 import logging
 import os
 from logging.handlers import RotatingFileHandler
 from fastapi import FastAPI, status, Depends
 from .modules.admin.dependencies import get_current_admin_user
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 
 from app.modules.analysis_result import models as analysis_result_models
 from app.modules.favorites import models as favorites_models
@@ -22,6 +23,8 @@ from .endpoints.admin import router as admin_router
 from .endpoints.recommendation import router as recommendation_router
 from .endpoints.interaction import router as interaction_router
 from .endpoints.favorites import router as favorites_router
+from .services.analysis_cache import listen_for_invalidations
+from .http_clients import http_clients
 
 logging.basicConfig(level=logging.INFO)
 
@@ -58,10 +61,19 @@ async def lifespan(app: FastAPI):
 
     logging.info("Запускаю приложение...")
 
+    await http_clients.start()
+    invalidation_listener = asyncio.create_task(listen_for_invalidations())
+
     yield
 
     logging.info("Останавливаю приложение...")
 
+    invalidation_listener.cancel()
+    with suppress(asyncio.CancelledError):
+        await invalidation_listener
+
+    await http_clients.close()
+
 
 app = FastAPI(lifespan=lifespan)
 
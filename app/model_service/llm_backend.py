@@ -0,0 +1,227 @@
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Optional
+
+from google import genai
+from google.genai.errors import ClientError, ServerError
+
+from app.config import get_settings
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+LLM_BACKEND_GEMINI = "gemini"
+LLM_BACKEND_FAKE = "fake"
+
+FAKE_STREAM_CHUNK_SIZE = 64
+
+_ALLOWED_LIST_RE = r"{label}:\s*(\[[^\]]*\])"
+_PLACE_SECTION_RE = re.compile(r"=== PLACE (\d+):")
+_TOP_PLACES_RE = re.compile(r"TOP (\d+) places")
+_USER_REQUEST_RE = re.compile(r'User request: "(.*)"')
+
+
+@dataclass
+class FakeLLMResponse:
+    text: str
+
+
+class _FakeAsyncModels:
+    """Повторяет client.aio.models из google-genai: generate_content и стрим."""
+
+    def __init__(self, backend: "FakeLLMClient"):
+        self._backend = backend
+
+    async def generate_content(self, *, model: str, contents: Any, config=None):
+        await self._backend.simulate_call()
+        return FakeLLMResponse(text=self._backend.render(contents))
+
+    async def generate_content_stream(
+        self, *, model: str, contents: Any, config=None
+    ) -> AsyncIterator[FakeLLMResponse]:
+        await self._backend.simulate_call(share=0.3)
+        text = self._backend.render(contents)
+        return self._stream(text)
+
+    async def _stream(self, text: str) -> AsyncIterator[FakeLLMResponse]:
+        chunks = [
+            text[i : i + FAKE_STREAM_CHUNK_SIZE]
+            for i in range(0, len(text), FAKE_STREAM_CHUNK_SIZE)
+        ]
+        # Остаток задержки размазываем по чанкам, как у настоящей генерации
+        delay = self._backend.sample_latency() * 0.7 / max(len(chunks), 1)
+        for chunk in chunks:
+            await asyncio.sleep(delay)
+            yield FakeLLMResponse(text=chunk)
+
+
+class _FakeAio:
+    def __init__(self, backend: "FakeLLMClient"):
+        self.models = _FakeAsyncModels(backend)
+
+
+class FakeLLMClient:
+    """
+    Локальная замена genai.Client для нагрузочных тестов без расхода квоты.
+
+    Ответ детерминирован (зависит только от текста промпта) и проходит
+    валидацию тех же схем, что и ответ Gemini. Задержка — логнормальная
+    с медианой latency_ms, ошибки 500 и 429 — с заданной вероятностью.
+    """
+
+    def __init__(
+        self,
+        latency_ms: int,
+        latency_sigma: float,
+        error_rate: float,
+        throttle_rate: float,
+        seed: Optional[int] = None,
+    ):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(seed)
+        self.aio = _FakeAio(self)
+
+    def sample_latency(self) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        return (self.latency_ms / 1000) * self._random.lognormvariate(
+            0, self.latency_sigma
+        )
+
+    async def simulate_call(self, share: float = 1.0):
+        await asyncio.sleep(self.sample_latency() * share)
+
+        roll = self._random.random()
+        if roll < self.throttle_rate:
+            raise ClientError(
+                429, {"error": {"message": "Fake quota exceeded", "status": "RESOURCE_EXHAUSTED"}}
+            )
+        if roll < self.throttle_rate + self.error_rate:
+            raise ServerError(
+                500, {"error": {"message": "Fake backend error", "status": "INTERNAL"}}
+            )
+
+    def render(self, contents: Any) -> str:
+        parts = contents if isinstance(contents, list) else [contents]
+        prompt = "\n".join(part for part in parts if isinstance(part, str))
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+
+        if _PLACE_SECTION_RE.search(prompt):
+            places = [
+                {"place_index": int(index), **self._analysis(prompt, rng)}
+                for index in _PLACE_SECTION_RE.findall(prompt)
+            ]
+            return json.dumps({"places": places}, ensure_ascii=False)
+
+        if "Analyze the place" in prompt:
+            return json.dumps(self._analysis(prompt, rng), ensure_ascii=False)
+
+        if "Compare two venues" in prompt:
+            return json.dumps(self._comparison(rng), ensure_ascii=False)
+
+        if "query generator for Google Maps" in prompt:
+            match = _USER_REQUEST_RE.search(prompt)
+            return json.dumps(
+                {
+                    "google_search_query": match.group(1) if match else "кафе",
+                    "place_type": "restaurant",
+                },
+                ensure_ascii=False,
+            )
+
+        match = _TOP_PLACES_RE.search(prompt)
+        if match:
+            reasons = {
+                str(i): "Подходит под запрос: хорошие отзывы и удобное расположение."
+                for i in range(int(match.group(1)))
+            }
+            return json.dumps({"reviews": reasons}, ensure_ascii=False)
+
+        if "search query" in prompt:
+            return "Уютная кофейня с хорошими отзывами"
+
+        return "{}"
+
+    @staticmethod
+    def _allowed(prompt: str, label: str, default: list[str]) -> list[str]:
+        match = re.search(_ALLOWED_LIST_RE.format(label=label), prompt)
+        if not match:
+            return default
+        try:
+            return json.loads(match.group(1)) or default
+        except ValueError:
+            return default
+
+    def _analysis(self, prompt: str, rng: random.Random) -> dict:
+        tags = self._allowed(prompt, "ALLOWED TAGS", ["cozy"])
+        scenarios = self._allowed(prompt, "ALLOWED SCENARIOS", ["friends"])
+        levels = ["Low", "Medium", "High"]
+
+        return {
+            "summary": {
+                "verdict": "Приятное место с хорошей атмосферой (тестовый ответ).",
+                "pros": ["Вкусная еда", "Вежливый персонал"],
+                "cons": ["Бывает шумно"],
+            },
+            "scores": {
+                "food": rng.randint(40, 100),
+                "service": rng.randint(40, 100),
+                "atmosphere": rng.randint(40, 100),
+                "value": rng.randint(40, 100),
+            },
+            "vibe_score": rng.randint(30, 100),
+            "tags": rng.sample(tags, k=min(3, len(tags))),
+            "price_level": rng.choice(["$", "$$", "$$$"]),
+            "best_for": rng.sample(scenarios, k=min(2, len(scenarios))),
+            "detailed_attributes": {
+                "has_wifi": rng.random() < 0.5,
+                "has_parking": rng.random() < 0.5,
+                "outdoor_seating": rng.random() < 0.5,
+                "noise_level": rng.choice(levels),
+                "service_speed": rng.choice(["Fast", "Average", "Slow"]),
+                "cleanliness": rng.choice(levels),
+            },
+        }
+
+    @staticmethod
+    def _comparison(rng: random.Random) -> dict:
+        sides = ["Place A", "Place B", "draw"]
+        return {
+            "winner_category": {
+                "food": rng.choice(sides),
+                "service": rng.choice(sides),
+                "atmosphere": rng.choice(sides),
+                "value": rng.choice(sides),
+            },
+            "key_differences": ["Разная атмосфера", "Разный уровень цен"],
+            "place_a_unique_pros": ["Тихо"],
+            "place_b_unique_pros": ["Большие порции"],
+            "verdict": "Оба места хороши, выбор зависит от повода (тестовый ответ).",
+        }
+
+
+def create_llm_client():
+    """Клиент LLM по настройке llm_backend: настоящий Gemini или локальная заглушка."""
+    if settings.llm_backend == LLM_BACKEND_FAKE:
+        logger.warning("[LLM] Using fake LLM backend, responses are synthetic")
+        return FakeLLMClient(
+            latency_ms=settings.fake_llm_latency_ms,
+            latency_sigma=settings.fake_llm_latency_sigma,
+            error_rate=settings.fake_llm_error_rate,
+            throttle_rate=settings.fake_llm_throttle_rate,
+            seed=settings.fake_llm_seed,
+        )
+
+    if settings.llm_backend == LLM_BACKEND_GEMINI:
+        return genai.Client(api_key=settings.gemini_api_key)
+
+    raise ValueError(f"Unknown llm_backend: {settings.llm_backend}")
@@ -0,0 +1,301 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import AsyncIterator, Optional
+
+from google.genai.errors import APIError
+
+from app.config import get_settings
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+# Коды, при которых Gemini просит притормозить
+THROTTLE_STATUS_CODES = {429, 503}
+
+MIN_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+# AIMD: при 429 скорость режется вдвое, при успехе растёт на 10% от базовой
+RATE_DECREASE_FACTOR = 0.5
+RATE_INCREASE_SHARE = 0.1
+MIN_RATE_SHARE = 0.1
+
+# Сколько токенов фоновые задачи оставляют интерактивным запросам
+BACKGROUND_TOKEN_RESERVE = 2
+MAX_WAKEUP_SECONDS = 1.0
+
+
+class LLMPriority(IntEnum):
+    INTERACTIVE = 0
+    DEFAULT = 1
+    BACKGROUND = 2
+
+
+_current_priority: ContextVar[LLMPriority] = ContextVar(
+    "llm_priority", default=LLMPriority.INTERACTIVE
+)
+
+
+@contextmanager
+def llm_priority(priority: LLMPriority):
+    """Все вызовы LLM внутри блока идут в указанную очередь."""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+@dataclass
+class LaneStats:
+    queue_depth: int = 0
+    requests: int = 0
+    throttled: int = 0
+    failed: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+    def record_wait(self, waited: float):
+        self.requests += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    def as_dict(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "failed": self.failed,
+            "avg_wait_seconds": round(self.wait_total / self.requests, 3)
+            if self.requests
+            else 0.0,
+            "max_wait_seconds": round(self.wait_max, 3),
+        }
+
+
+class LLMGateway:
+    """
+    Общая для процесса точка входа во все вызовы Gemini.
+
+    Token bucket ограничивает частоту, семафор — число одновременных запросов,
+    очередь с приоритетами пропускает интерактивные запросы раньше фоновых.
+    На 429/503 gateway уменьшает скорость и делает паузу с экспоненциальным backoff.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        burst: int,
+        max_concurrency: int,
+        max_retries: int,
+    ):
+        self.base_rate = requests_per_minute / 60
+        self.rate = self.base_rate
+        self.capacity = burst
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.inflight = 0
+        self.backoff = 0.0
+        self.blocked_until = 0.0
+
+        self._waiters: list[tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._cond: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {priority: LaneStats() for priority in LLMPriority}
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Ожидающие старого loop'а уже не проснутся
+            self._loop = loop
+            self._cond = asyncio.Condition()
+            self._waiters.clear()
+            self.inflight = 0
+        return self._cond
+
+    def _refill(self, now: float):
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def _tokens_needed(self, priority: int) -> float:
+        if priority == LLMPriority.BACKGROUND:
+            return min(self.capacity, 1 + BACKGROUND_TOKEN_RESERVE)
+        return 1
+
+    def _can_start(self, entry: tuple[int, int], now: float) -> bool:
+        return (
+            self._waiters[0] == entry
+            and now >= self.blocked_until
+            and self.inflight < self.max_concurrency
+            and self.tokens >= self._tokens_needed(entry[0])
+        )
+
+    def _next_wakeup(self, priority: int, now: float) -> float:
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        missing = self._tokens_needed(priority) - self.tokens
+        if missing > 0:
+            return min(MAX_WAKEUP_SECONDS, missing / self.rate)
+        return MAX_WAKEUP_SECONDS
+
+    async def _acquire(self, priority: LLMPriority):
+        cond = self._condition()
+        entry = (int(priority), next(self._seq))
+        stats = self.stats[priority]
+        started = time.monotonic()
+
+        async with cond:
+            heapq.heappush(self._waiters, entry)
+            stats.queue_depth += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._can_start(entry, now):
+                        break
+                    try:
+                        await asyncio.wait_for(
+                            cond.wait(), self._next_wakeup(entry[0], now)
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+
+                heapq.heappop(self._waiters)
+                self.tokens -= 1
+                self.inflight += 1
+            except BaseException:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                raise
+            finally:
+                stats.queue_depth -= 1
+                cond.notify_all()
+
+        stats.record_wait(time.monotonic() - started)
+
+    async def _release(self, throttled: bool):
+        cond = self._condition()
+        async with cond:
+            self.inflight = max(0, self.inflight - 1)
+            now = time.monotonic()
+            self._refill(now)
+
+            if throttled:
+                self.backoff = min(
+                    MAX_BACKOFF_SECONDS, max(MIN_BACKOFF_SECONDS, self.backoff * 2)
+                )
+                self.blocked_until = max(self.blocked_until, now + self.backoff)
+                self.rate = max(
+                    self.base_rate * MIN_RATE_SHARE, self.rate * RATE_DECREASE_FACTOR
+                )
+                self.tokens = min(self.tokens, 0.0)
+                logger.warning(
+                    f"[LLM-GATEWAY] Throttled, pause {self.backoff:.1f}s, "
+                    f"rate {self.rate * 60:.1f}/min"
+                )
+            else:
+                self.backoff = 0.0
+                self.rate = min(
+                    self.base_rate, self.rate + self.base_rate * RATE_INCREASE_SHARE
+                )
+
+            cond.notify_all()
+
+    async def generate_content(
+        self, client, *, priority: Optional[LLMPriority] = None, **kwargs
+    ):
+        """Обёртка над client.aio.models.generate_content с очередью и ретраями."""
+        priority = priority if priority is not None else _current_priority.get()
+        stats = self.stats[priority]
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(priority)
+            throttled = False
+            try:
+                return await client.aio.models.generate_content(**kwargs)
+            except APIError as e:
+                throttled = e.code in THROTTLE_STATUS_CODES
+                if throttled:
+                    stats.throttled += 1
+                    if attempt < self.max_retries:
+                        continue
+                stats.failed += 1
+                raise
+            except Exception:
+                stats.failed += 1
+                raise
+            finally:
+                await self._release(throttled)
+
+    async def generate_content_stream(
+        self, client, *, priority: Optional[LLMPriority] = None, **kwargs
+    ) -> AsyncIterator:
+        """
+        Стриминговый вариант generate_content. Слот держится до конца стрима;
+        ретрай возможен только пока клиенту не ушёл ни один чанк.
+        """
+        priority = priority if priority is not None else _current_priority.get()
+        stats = self.stats[priority]
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(priority)
+            throttled = False
+            started_streaming = False
+            try:
+                stream = await client.aio.models.generate_content_stream(**kwargs)
+                async for chunk in stream:
+                    started_streaming = True
+                    yield chunk
+                return
+            except APIError as e:
+                throttled = e.code in THROTTLE_STATUS_CODES
+                if throttled:
+                    stats.throttled += 1
+                    if attempt < self.max_retries and not started_streaming:
+                        continue
+                stats.failed += 1
+                raise
+            except Exception:
+                stats.failed += 1
+                raise
+            finally:
+                await self._release(throttled)
+
+    def metrics(self) -> dict:
+        now = time.monotonic()
+        return {
+            "rate_per_minute": round(self.rate * 60, 2),
+            "base_rate_per_minute": round(self.base_rate * 60, 2),
+            "tokens_available": round(
+                min(self.capacity, self.tokens + (now - self.updated_at) * self.rate), 2
+            ),
+            "inflight": self.inflight,
+            "backoff_seconds": self.backoff,
+            "paused_for_seconds": round(max(0.0, self.blocked_until - now), 2),
+            "lanes": {
+                priority.name.lower(): stats.as_dict()
+                for priority, stats in self.stats.items()
+            },
+        }
+
+
+llm_gateway = LLMGateway(
+    requests_per_minute=settings.llm_requests_per_minute,
+    burst=settings.llm_burst,
+    max_concurrency=settings.llm_max_concurrency,
+    max_retries=settings.llm_max_retries,
+)
@@ -1,10 +1,20 @@
+import asyncio
+import hashlib
 import json
 import logging
-from google import genai
+from typing import Any, AsyncIterator, Optional
 import httpx
 import io
 from PIL import Image
 from app.config import get_settings
+from app.dependencies import get_redis_binary_client
+from app.modules.common import cache_codec
+from app.modules.common.json_stream import TopLevelJSONFieldParser
+from app.model_service.photo_cache import photo_cache
+from app.model_service.prompt_compaction import compact_reviews, format_review_line
+from app.http_clients import http_clients
+from app.model_service.llm_gateway import llm_gateway
+from app.model_service.llm_backend import create_llm_client
 from app.modules.analysis_result.schemas import (
     AIAnalysis,
     Summary,
@@ -18,7 +28,6 @@ from app.modules.place.schemas import PlaceInfoDTO
 from app.modules.pro_mode.utils import PerformanceTimer
 
 settings = get_settings()
-api_key = settings.gemini_api_key
 
 logging.basicConfig(
     level=logging.INFO,
@@ -27,7 +36,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-client = genai.Client(api_key=api_key)
+client = create_llm_client()
+
+# Меняйте при любой правке промпта анализа — старые результаты перестанут переиспользоваться
+PROMPT_VERSION = "place-analysis-v2"
+ANALYSIS_MODEL_NAME = "gemini-2.5-flash-lite"
+MAX_PROMPT_REVIEWS = 50
+MAX_PROMPT_PHOTOS = 3
+
+# Ограничения на фото для анализа
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+IMAGE_DOWNLOAD_DEADLINE = 8.0
+IMAGE_MAX_SIDE = 768  # Gemini всё равно режет картинку на тайлы 768x768
+
+COMPARISON_ERROR_VERDICT = "Ошибка"
+ANALYSIS_ERROR_VERDICT = "Ошибка анализа"
+# Служебное "поле" стрима с итоговым провалидированным AIAnalysis
+ANALYSIS_RESULT_FIELD = "__analysis__"
+
+GEMINI_RESULT_CACHE_TTL = 3600 * 24 * settings.gemini_result_cache_ttl_days
 
 ALLOWED_TAGS = [
     "quiet",
@@ -63,49 +90,196 @@ ALLOWED_SCENARIOS = [
 ]
 
 
+class ImageTooLargeError(Exception):
+    pass
+
+
+def _decode_and_downscale(data: bytes) -> Image.Image:
+    img = Image.open(io.BytesIO(data))
+    img.draft("RGB", (IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+    img = img.convert("RGB")
+    img.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+    return img
+
+
+def _load_cached_image(url: str) -> Image.Image | None:
+    data = photo_cache.get(url)
+    if data is None:
+        return None
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        img.load()
+        return img
+    except Exception:
+        return None
+
+
+def _process_downloaded_image(url: str, data: bytes) -> Image.Image:
+    img = _decode_and_downscale(data)
+
+    # В кеш кладём уже уменьшенную версию — её и отправляем в Gemini
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=85)
+    photo_cache.put(url, out.getvalue())
+    return img
+
+
+async def _download_image(http: httpx.AsyncClient, url: str) -> Image.Image:
+    # Диск и PIL блокируют, поэтому всё это выполняется в пуле потоков
+    cached = await asyncio.to_thread(_load_cached_image, url)
+    if cached is not None:
+        return cached
+
+    async with http.stream("GET", url) as resp:
+        resp.raise_for_status()
+
+        declared_size = int(resp.headers.get("content-length") or 0)
+        if declared_size > MAX_IMAGE_BYTES:
+            raise ImageTooLargeError(f"{declared_size} bytes")
+
+        buffer = bytearray()
+        async for chunk in resp.aiter_bytes():
+            buffer.extend(chunk)
+            if len(buffer) > MAX_IMAGE_BYTES:
+                raise ImageTooLargeError(f"> {MAX_IMAGE_BYTES} bytes")
+
+    return await asyncio.to_thread(_process_downloaded_image, url, bytes(buffer))
+
+
 async def download_images(urls: list[str], limit: int = 3):
+    urls = urls[:limit]  # Берем только первые N фото, чтобы не перегружать
     with PerformanceTimer(f"Download Images (count={len(urls)})"):
+        if not urls:
+            return []
+
+        http = http_clients.images
+        tasks = [asyncio.create_task(_download_image(http, url)) for url in urls]
+        _, pending = await asyncio.wait(tasks, timeout=IMAGE_DOWNLOAD_DEADLINE)
+
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(
+                f"⚠️ {len(pending)} фото не успели скачаться за {IMAGE_DOWNLOAD_DEADLINE}с"
+            )
+            await asyncio.gather(*pending, return_exceptions=True)
+
         images = []
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            for url in urls[:limit]:  # Берем только первые N фото, чтобы не перегружать
-                try:
-                    resp = await client.get(url)
-                    if resp.status_code == 200:
-                        img_bytes = io.BytesIO(resp.content)
-                        img = Image.open(img_bytes)
-                        images.append(img)
-                except Exception as e:
-                    logger.warning(f"⚠️ Не удалось скачать фото: {e}")
-                    continue
+        for task in tasks:
+            if task.cancelled():
+                continue
+            if task.exception():
+                logger.warning(f"⚠️ Не удалось скачать фото: {task.exception()}")
+                continue
+            images.append(task.result())
         return images
 
 
-async def analyze_place_with_gemini(place: PlaceInfoDTO) -> AIAnalysis:
-    with PerformanceTimer(f"Analyze Place '{place.name}'"):
-        logger.info(f"Запуск анализа для места: '{place.name}'")
+def get_analysis_fingerprint(place: PlaceInfoDTO) -> str:
+    """
+    Стабильный хеш всего, что попадает в промпт: отзывы, описание, фото,
+    версия промпта и модель. Одинаковый вход — одинаковый результат Gemini.
+    """
+    payload = {
+        "prompt_version": PROMPT_VERSION,
+        "review_token_budget": settings.gemini_review_token_budget,
+        "model": ANALYSIS_MODEL_NAME,
+        "name": place.name,
+        "description": place.description or "",
+        "photos": list(place.photos[:MAX_PROMPT_PHOTOS]),
+        "reviews": [
+            [r.date, r.rating, r.author, r.text]
+            for r in place.reviews[:MAX_PROMPT_REVIEWS]
+        ],
+        "tags": ALLOWED_TAGS,
+        "scenarios": ALLOWED_SCENARIOS,
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
-        if not place.reviews and not place.description:
-            logger.warning("Нет данных для анализа (отзывов и описания нет).")
-            return _get_empty_analysis()
 
-        image_objects = []
-        if place.photos:
-            logger.info(f"Скачиваем фото ({len(place.photos)} шт found)...")
-            image_objects = await download_images(place.photos, limit=3)
-            logger.info(f"Скачано {len(image_objects)} изображений для анализа.")
+def get_fingerprint_cache_key(fingerprint: str) -> str:
+    return f"gemini_analysis:{fingerprint}"
 
-        reviews_text_list = []
-        for r in place.reviews[:50]:
-            reviews_text_list.append(
-                f"Date: {r.date} | Rating: {r.rating} | Author: {r.author}\nReview: {r.text}"
-            )
-        reviews_text = "\n---\n".join(reviews_text_list)
 
-        description_context = ""
-        if place.description:
-            description_context = f"Official Description: {place.description}"
+async def _get_analysis_by_fingerprint(fingerprint: str) -> Optional[AIAnalysis]:
+    try:
+        cached = await get_redis_binary_client().get(
+            get_fingerprint_cache_key(fingerprint)
+        )
+    except Exception as e:
+        logger.warning(f"Кеш анализов недоступен: {e}")
+        return None
 
-        prompt = f"""
+    return cache_codec.decode_model(cached, AIAnalysis)
+
+
+async def _set_analysis_by_fingerprint(fingerprint: str, analysis: AIAnalysis):
+    try:
+        await get_redis_binary_client().set(
+            get_fingerprint_cache_key(fingerprint),
+            cache_codec.encode(analysis),
+            ex=GEMINI_RESULT_CACHE_TTL,
+        )
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить анализ в кеш: {e}")
+
+
+ANALYSIS_OUTPUT_SCHEMA = """{
+            "summary": {
+                "verdict": "Short summary in Russian",
+                "pros": ["List of pros in Russian"],
+                "cons": ["List of cons in Russian"]
+            },
+            "scores": { "food": int(1-100), "service": int, "atmosphere": int, "value": int },
+            "vibe_score": int(0-100),
+            "tags": ["List from allowed tags"],
+            "price_level": "$, $$, or $$$",
+            "best_for": ["List from allowed scenarios"],
+            "detailed_attributes": {
+                "has_wifi": bool, "has_parking": bool, "outdoor_seating": bool,
+                "noise_level": "Low/Medium/High", "service_speed": "Fast/Average/Slow", "cleanliness": "Low/Medium/High"
+            }
+        }"""
+
+
+def _build_reviews_text(place: PlaceInfoDTO) -> str:
+    reviews = compact_reviews(
+        place.reviews[:MAX_PROMPT_REVIEWS], settings.gemini_review_token_budget
+    )
+    return "\n".join(format_review_line(r) for r in reviews)
+
+
+def _build_description_context(place: PlaceInfoDTO) -> str:
+    if place.description:
+        return f"Official Description: {place.description}"
+    return ""
+
+
+def _parse_analysis(result_json: dict) -> AIAnalysis:
+    return AIAnalysis(
+        summary=Summary(**result_json["summary"]),
+        scores=Scores(**result_json["scores"]),
+        vibe_score=result_json["vibe_score"],
+        tags=result_json["tags"],
+        price_level=result_json["price_level"],
+        best_for=result_json["best_for"],
+        detailed_attributes=DetailedAttributes(**result_json["detailed_attributes"]),
+    )
+
+
+async def _build_analysis_contents(place: PlaceInfoDTO) -> list:
+    image_objects = []
+    if place.photos:
+        logger.info(f"Скачиваем фото ({len(place.photos)} шт found)...")
+        image_objects = await download_images(place.photos, limit=MAX_PROMPT_PHOTOS)
+        logger.info(f"Скачано {len(image_objects)} изображений для анализа.")
+
+    reviews_text = _build_reviews_text(place)
+    description_context = _build_description_context(place)
+
+    prompt = f"""
         You are an expert restaurant critic. Analyze the place "{place.name}".
         
         CONTEXT:
@@ -119,62 +293,222 @@ async def analyze_place_with_gemini(place: PlaceInfoDTO) -> AIAnalysis:
         {reviews_text}
         
         Output MUST be a valid JSON object matching this schema:
-        {{
-            "summary": {{
-                "verdict": "Short summary in Russian",
-                "pros": ["List of pros in Russian"],
-                "cons": ["List of cons in Russian"]
-            }},
-            "scores": {{ "food": int(1-100), "service": int, "atmosphere": int, "value": int }},
-            "vibe_score": int(0-100),
-            "tags": ["List from allowed tags"],
-            "price_level": "$, $$, or $$$",
-            "best_for": ["List from allowed scenarios"],
-            "detailed_attributes": {{
-                "has_wifi": bool, "has_parking": bool, "outdoor_seating": bool,
-                "noise_level": "Low/Medium/High", "service_speed": "Fast/Average/Slow", "cleanliness": "Low/Medium/High"
-            }}
-        }}
+        {ANALYSIS_OUTPUT_SCHEMA}
     
         ALLOWED TAGS: {json.dumps(ALLOWED_TAGS)}
         ALLOWED SCENARIOS: {json.dumps(ALLOWED_SCENARIOS)}
         """
 
-        content_parts = [prompt]
-        content_parts.extend(image_objects)
+    content_parts = [prompt]
+    content_parts.extend(image_objects)
+    return content_parts
+
+
+async def analyze_place_with_gemini(place: PlaceInfoDTO) -> AIAnalysis:
+    with PerformanceTimer(f"Analyze Place '{place.name}'"):
+        logger.info(f"Запуск анализа для места: '{place.name}'")
+
+        if not place.reviews and not place.description:
+            logger.warning("Нет данных для анализа (отзывов и описания нет).")
+            return _get_empty_analysis()
+
+        fingerprint = get_analysis_fingerprint(place)
+        cached_analysis = await _get_analysis_by_fingerprint(fingerprint)
+        if cached_analysis is not None:
+            logger.info(
+                f"Входные данные не изменились ({fingerprint[:12]}), переиспользуем анализ"
+            )
+            return cached_analysis
+
+        content_parts = await _build_analysis_contents(place)
 
         # Optimization: Use Flash-Lite
-        model_name = "gemini-2.5-flash-lite"
+        model_name = ANALYSIS_MODEL_NAME
 
         try:
-            response = await client.aio.models.generate_content(
-                model=model_name, contents=content_parts, config={"response_mime_type": "application/json"}
+            response = await llm_gateway.generate_content(
+                client, model=model_name, contents=content_parts, config={"response_mime_type": "application/json"}
             )
 
             result_json = json.loads(response.text)
             logger.info(f"Анализ завершен! Vibe Score: {result_json.get('vibe_score')}")
 
-            return AIAnalysis(
-                summary=Summary(**result_json["summary"]),
-                scores=Scores(**result_json["scores"]),
-                vibe_score=result_json["vibe_score"],
-                tags=result_json["tags"],
-                price_level=result_json["price_level"],
-                best_for=result_json["best_for"],
-                detailed_attributes=DetailedAttributes(
-                    **result_json["detailed_attributes"]
-                ),
-            )
+            analysis = _parse_analysis(result_json)
 
         except Exception as e:
             logger.error(f"Ошибка Gemini: {e}")
             return _get_empty_analysis()
 
+        # Кешируем только успешные ответы, ошибка не должна "залипнуть" на месяц
+        await _set_analysis_by_fingerprint(fingerprint, analysis)
+        return analysis
+
+
+async def stream_place_analysis_with_gemini(
+    place: PlaceInfoDTO,
+) -> AsyncIterator[tuple[str, Any]]:
+    """
+    Стриминговый анализ: отдаёт (поле, значение) по мере того, как Gemini
+    дописывает поля верхнего уровня. Последним всегда идёт
+    (ANALYSIS_RESULT_FIELD, AIAnalysis) — провалидированный итог.
+    """
+    with PerformanceTimer(f"Stream Analyze Place '{place.name}'"):
+        if not place.reviews and not place.description:
+            logger.warning("Нет данных для анализа (отзывов и описания нет).")
+            yield ANALYSIS_RESULT_FIELD, _get_empty_analysis()
+            return
+
+        fingerprint = get_analysis_fingerprint(place)
+        cached_analysis = await _get_analysis_by_fingerprint(fingerprint)
+        if cached_analysis is not None:
+            for field, value in cached_analysis.model_dump(mode="json").items():
+                yield field, value
+            yield ANALYSIS_RESULT_FIELD, cached_analysis
+            return
+
+        content_parts = await _build_analysis_contents(place)
+
+        parser = TopLevelJSONFieldParser()
+        result_json = {}
+        try:
+            async for chunk in llm_gateway.generate_content_stream(
+                client,
+                model=ANALYSIS_MODEL_NAME,
+                contents=content_parts,
+                config={"response_mime_type": "application/json"},
+            ):
+                for field, value in parser.feed(chunk.text or ""):
+                    result_json[field] = value
+                    yield field, value
+
+            analysis = _parse_analysis(result_json)
+        except Exception as e:
+            logger.error(f"Ошибка стриминга Gemini: {e}")
+            yield ANALYSIS_RESULT_FIELD, _get_empty_analysis()
+            return
+
+        await _set_analysis_by_fingerprint(fingerprint, analysis)
+        yield ANALYSIS_RESULT_FIELD, analysis
+
+
+async def analyze_places_with_gemini_batch(
+    places: list[PlaceInfoDTO],
+) -> list[AIAnalysis]:
+    """
+    Фоновый анализ нескольких мест одним запросом к Gemini: общая часть промпта
+    (схема, теги, сценарии) оплачивается один раз. Места, которые модель
+    пропустила или вернула невалидными, анализируются по одному.
+    """
+    results: list[AIAnalysis | None] = [None] * len(places)
+    pending: list[tuple[int, PlaceInfoDTO, str]] = []
+
+    for i, place in enumerate(places):
+        if not place.reviews and not place.description:
+            results[i] = _get_empty_analysis()
+            continue
+
+        fingerprint = get_analysis_fingerprint(place)
+        cached_analysis = await _get_analysis_by_fingerprint(fingerprint)
+        if cached_analysis is not None:
+            results[i] = cached_analysis
+        else:
+            pending.append((i, place, fingerprint))
+
+    if len(pending) == 1:
+        i, place, _ = pending[0]
+        results[i] = await analyze_place_with_gemini(place)
+        return results
+
+    if pending:
+        with PerformanceTimer(f"Analyze Places Batch (count={len(pending)})"):
+            images_per_place = await asyncio.gather(
+                *[
+                    download_images(place.photos, limit=MAX_PROMPT_PHOTOS)
+                    for _, place, _ in pending
+                ]
+            )
+
+            content_parts = [
+                f"""
+        You are an expert restaurant critic. Analyze each of the {len(pending)} places below independently.
+        Do not mix information between places.
+
+        INPUT DATA:
+        - Every place has its own section with context and text reviews.
+        - Images of a place (if any) are attached right after its section.
+
+        For EVERY place produce an object matching this schema:
+        {ANALYSIS_OUTPUT_SCHEMA}
+
+        Output MUST be a valid JSON object:
+        {{"places": [{{"place_index": int, ...fields from the schema above}}]}}
+
+        ALLOWED TAGS: {json.dumps(ALLOWED_TAGS)}
+        ALLOWED SCENARIOS: {json.dumps(ALLOWED_SCENARIOS)}
+        """
+            ]
+            for place_index, ((_, place, _), images) in enumerate(
+                zip(pending, images_per_place)
+            ):
+                content_parts.append(
+                    f"""
+        === PLACE {place_index}: "{place.name}" ===
+        CONTEXT:
+        {_build_description_context(place)}
+
+        REVIEWS:
+        {_build_reviews_text(place)}
+        """
+                )
+                content_parts.extend(images)
+
+            parsed: dict[int, AIAnalysis] = {}
+            try:
+                response = await llm_gateway.generate_content(
+                    client,
+                    model=ANALYSIS_MODEL_NAME,
+                    contents=content_parts,
+                    config={"response_mime_type": "application/json"},
+                )
+                batch_json = json.loads(response.text)
+
+                for item in batch_json.get("places", []):
+                    try:
+                        parsed[int(item["place_index"])] = _parse_analysis(item)
+                    except Exception as e:
+                        logger.warning(f"Невалидный результат в батче: {e}")
+            except Exception as e:
+                logger.error(f"Ошибка батч-анализа Gemini: {e}")
+
+            fallback = []
+            for place_index, (i, place, fingerprint) in enumerate(pending):
+                analysis = parsed.get(place_index)
+                if analysis is None:
+                    fallback.append((i, place))
+                    continue
+
+                results[i] = analysis
+                await _set_analysis_by_fingerprint(fingerprint, analysis)
+
+            logger.info(
+                f"Батч: {len(pending) - len(fallback)} из {len(pending)} мест разобрано, "
+                f"{len(fallback)} уходят в одиночный анализ"
+            )
+
+        if fallback:
+            single_results = await asyncio.gather(
+                *[analyze_place_with_gemini(place) for _, place in fallback]
+            )
+            for (i, _), analysis in zip(fallback, single_results):
+                results[i] = analysis
+
+    return results
+
 
 def _get_empty_analysis() -> AIAnalysis:
 
     return AIAnalysis(
-        summary=Summary(verdict="Ошибка анализа", pros=[], cons=[]),
+        summary=Summary(verdict=ANALYSIS_ERROR_VERDICT, pros=[], cons=[]),
         scores=Scores(food=0, service=0, atmosphere=0, value=0),
         vibe_score=0,
         tags=[],
@@ -184,6 +518,11 @@ def _get_empty_analysis() -> AIAnalysis:
     )
 
 
+def is_empty_analysis(analysis: AIAnalysis) -> bool:
+    """Заглушка вместо анализа: ошибка Gemini или нечего анализировать."""
+    return analysis.summary.verdict == ANALYSIS_ERROR_VERDICT and analysis.vibe_score == 0
+
+
 async def compare_places_with_gemini(
     analysis_a: AIAnalysis, analysis_b: AIAnalysis, name_a: str, name_b: str
 ) -> ComparisonData:
@@ -214,8 +553,8 @@ async def compare_places_with_gemini(
         try:
             # Optimization: Use Flash-Lite
             # Optimization: Use Flash-Lite
-            response = await client.aio.models.generate_content(
-                model="gemini-2.5-flash-lite", contents=prompt, config={"response_mime_type": "application/json"}
+            response = await llm_gateway.generate_content(
+                client, model="gemini-2.5-flash-lite", contents=prompt, config={"response_mime_type": "application/json"}
             )
             res = json.loads(response.text)
 
@@ -238,7 +577,7 @@ async def compare_places_with_gemini(
                 key_differences=["Ошибка"],
                 place_a_unique_pros=[],
                 place_b_unique_pros=[],
-                verdict="Ошибка",
+                verdict=COMPARISON_ERROR_VERDICT,
                 scores=ComparisonScores(
                     place_a=Scores(food=0, service=0, atmosphere=0, value=0),
                     place_b=Scores(food=0, service=0, atmosphere=0, value=0),
@@ -0,0 +1,115 @@
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.config import get_settings
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+# Как часто (в записях) проверять размер кеша и вычищать старые файлы
+EVICTION_CHECK_EVERY = 50
+
+
+class PhotoCache:
+    """
+    Дисковый кеш уменьшенных фото мест, ключ — sha256 от URL.
+
+    Каталог может быть общим для API и Celery (shared volume): запись атомарная
+    (tmp + os.replace). TTL считается от записи (mtime), LRU — по atime,
+    который обновляется при чтении и не продлевает жизнь файла.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._writes_since_eviction = 0
+
+    def _path_for(self, url: str) -> Path:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.directory / digest[:2] / f"{digest}.jpg"
+
+    def get(self, url: str) -> Optional[bytes]:
+        path = self._path_for(url)
+        try:
+            now = time.time()
+            written_at = path.stat().st_mtime
+            if now - written_at > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                return None
+
+            data = path.read_bytes()
+            os.utime(path, (now, written_at))
+            return data
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"[PHOTO-CACHE] Read failed for {path.name}: {e}")
+            return None
+
+    def put(self, url: str, data: bytes):
+        path = self._path_for(url)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                Path(tmp_path).unlink(missing_ok=True)
+                raise
+        except OSError as e:
+            logger.warning(f"[PHOTO-CACHE] Write failed for {path.name}: {e}")
+            return
+
+        self._writes_since_eviction += 1
+        if self._writes_since_eviction >= EVICTION_CHECK_EVERY:
+            self._writes_since_eviction = 0
+            self.evict()
+
+    def evict(self):
+        """Удаляет просроченные файлы, затем самые давно читанные до лимита по размеру."""
+        now = time.time()
+        entries = []
+        total_size = 0
+
+        for path in self.directory.glob("*/*.jpg"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+
+            if now - stat.st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                continue
+
+            entries.append((stat.st_atime, stat.st_size, path))
+            total_size += stat.st_size
+
+        if total_size <= self.max_bytes:
+            return
+
+        entries.sort()
+        removed = 0
+        for _, size, path in entries:
+            if total_size <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+            removed += 1
+
+        logger.info(f"[PHOTO-CACHE] Evicted {removed} files, {total_size} bytes left")
+
+
+photo_cache = PhotoCache(
+    directory=settings.photo_cache_dir,
+    max_bytes=settings.photo_cache_max_mb * 1024 * 1024,
+    ttl_seconds=settings.photo_cache_ttl_days * 3600 * 24,
+)
@@ -0,0 +1,115 @@
+import logging
+import re
+from datetime import datetime
+from app.modules.place.schemas import ReviewDTO
+
+logger = logging.getLogger(__name__)
+
+# Грубая оценка без вызова count_tokens: ~4 символа на токен
+CHARS_PER_TOKEN = 4
+
+MAX_REVIEW_CHARS = 600
+MIN_REVIEW_WORDS = 3
+NEAR_DUPLICATE_THRESHOLD = 0.8
+SHINGLE_SIZE = 3
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _review_day(date: str) -> str:
+    # От ISO-даты оставляем только день, относительные ("2 weeks ago") — как есть
+    try:
+        return datetime.fromisoformat(date).date().isoformat()
+    except ValueError:
+        return date
+
+
+def format_review_line(review: ReviewDTO) -> str:
+    # Автор ничего не даёт анализу
+    date = _review_day(review.date or "")
+    return f"[{date} | {review.rating:g}★] {review.text}"
+
+
+def _shingles(words: list[str]) -> set[tuple[str, ...]]:
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)}
+    return {
+        tuple(words[i : i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,.;:!?") + "…"
+
+
+def compact_reviews(reviews: list[ReviewDTO], token_budget: int) -> list[ReviewDTO]:
+    """
+    Сжимает отзывы перед отправкой в LLM: убирает пустые, точные и почти
+    одинаковые дубли, малоинформативные ("Супер!"), обрезает длинные и
+    набирает отзывы в исходном порядке (новые первыми), пока влезают в бюджет.
+    """
+    tokens_before = sum(estimate_tokens(format_review_line(r)) for r in reviews)
+
+    informative: list[ReviewDTO] = []
+    short: list[ReviewDTO] = []
+    seen_exact: set[str] = set()
+    seen_shingles: list[set] = []
+
+    for review in reviews:
+        text = " ".join((review.text or "").split())
+        if not text:
+            continue
+
+        words = _WORD_RE.findall(text.lower())
+        normalized = " ".join(words)
+        if not normalized or normalized in seen_exact:
+            continue
+
+        shingles = _shingles(words)
+        if any(
+            _jaccard(shingles, seen) >= NEAR_DUPLICATE_THRESHOLD
+            for seen in seen_shingles
+        ):
+            continue
+
+        seen_exact.add(normalized)
+        seen_shingles.append(shingles)
+
+        compacted = review.model_copy(
+            update={"text": _truncate(text, MAX_REVIEW_CHARS)}
+        )
+        if len(words) < MIN_REVIEW_WORDS:
+            short.append(compacted)
+        else:
+            informative.append(compacted)
+
+    # Если содержательных отзывов нет, лучше короткие, чем ничего
+    candidates = informative or short
+
+    selected: list[ReviewDTO] = []
+    tokens_after = 0
+    for review in candidates:
+        cost = estimate_tokens(format_review_line(review))
+        if tokens_after + cost > token_budget:
+            continue
+        selected.append(review)
+        tokens_after += cost
+
+    logger.info(
+        f"[PROMPT] Reviews {len(reviews)} -> {len(selected)}, "
+        f"~{tokens_before} -> ~{tokens_after} tokens (budget {token_budget})"
+    )
+    return selected
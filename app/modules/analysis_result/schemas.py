@@ -1,5 +1,6 @@
 from pydantic import ConfigDict, BaseModel
 from typing import Optional, List
+from datetime import datetime
 from ..place.schemas import PlaceInfo
 
 
@@ -45,10 +46,26 @@ class AIAnalysis(BaseModel):
 class AIResponseOut(BaseModel):
     place_info: PlaceInfo
     ai_analysis: AIAnalysis
+    analyzed_at: Optional[datetime] = None
+    is_stale: bool = False
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class BatchAnalyzeRequest(BaseModel):
+    urls: List[str]
+    limit: int = 10
+    concurrency: Optional[int] = None
+
+
+class BatchAnalyzeItem(BaseModel):
+    index: int
+    url: str
+    status: str
+    result: Optional[AIResponseOut] = None
+    detail: Optional[str] = None
+
+
 class CompareRequest(BaseModel):
     url_a: str
     url_b: str
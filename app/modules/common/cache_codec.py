@@ -0,0 +1,97 @@
+import json
+import logging
+import zlib
+from typing import Any, Optional, Type, TypeVar
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Формат записи: b"VC" + версия (1 байт) + флаги (1 байт) + payload
+CODEC_MAGIC = b"VC"
+CODEC_VERSION = 1
+HEADER_SIZE = 4
+
+FLAG_ZLIB = 0x01
+
+COMPRESSION_THRESHOLD = 1024
+COMPRESSION_LEVEL = 6
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def _pack(payload: bytes) -> bytes:
+    flags = 0
+    if len(payload) >= COMPRESSION_THRESHOLD:
+        compressed = zlib.compress(payload, COMPRESSION_LEVEL)
+        if len(compressed) < len(payload):
+            payload = compressed
+            flags |= FLAG_ZLIB
+
+    return CODEC_MAGIC + bytes((CODEC_VERSION, flags)) + payload
+
+
+def _unpack(data: bytes | str | None) -> Optional[bytes]:
+    if not data:
+        return None
+
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+
+    if not data.startswith(CODEC_MAGIC):
+        # Старые записи — обычный JSON-текст, читаем как есть
+        if data[:1] in (b"{", b"["):
+            return data
+        return None
+
+    if len(data) < HEADER_SIZE:
+        return None
+
+    version, flags = data[2], data[3]
+    if version != CODEC_VERSION:
+        logger.info(f"[CACHE-CODEC] Discarding entry with codec version {version}")
+        return None
+
+    payload = data[HEADER_SIZE:]
+    if flags & FLAG_ZLIB:
+        try:
+            payload = zlib.decompress(payload)
+        except zlib.error as e:
+            logger.warning(f"[CACHE-CODEC] Corrupted entry: {e}")
+            return None
+
+    return payload
+
+
+def encode(value: Any) -> bytes:
+    if isinstance(value, BaseModel):
+        payload = value.model_dump_json().encode("utf-8")
+    else:
+        payload = json.dumps(
+            value, ensure_ascii=False, separators=(",", ":"), default=str
+        ).encode("utf-8")
+
+    return _pack(payload)
+
+
+def decode(data: bytes | str | None) -> Any:
+    payload = _unpack(data)
+    if payload is None:
+        return None
+
+    try:
+        return json.loads(payload)
+    except ValueError as e:
+        logger.warning(f"[CACHE-CODEC] Invalid JSON payload: {e}")
+        return None
+
+
+def decode_model(data: bytes | str | None, model: Type[ModelT]) -> Optional[ModelT]:
+    payload = _unpack(data)
+    if payload is None:
+        return None
+
+    try:
+        return model.model_validate_json(payload)
+    except ValidationError as e:
+        logger.warning(f"[CACHE-CODEC] Entry does not match {model.__name__}: {e}")
+        return None
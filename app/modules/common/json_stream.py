@@ -0,0 +1,88 @@
+import json
+import logging
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class TopLevelJSONFieldParser:
+    """
+    Инкрементальный разбор JSON-объекта, который приходит кусками (стрим LLM).
+
+    feed() возвращает поля верхнего уровня, значения которых уже закрылись:
+    {"summary": {...}, "scores": {...}, ...} -> [("summary", {...}), ...].
+    Вложенные объекты и массивы отдаются целиком, когда закрыты.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self._finished = False
+
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+
+    def feed(self, chunk: str) -> list[tuple[str, Any]]:
+        self._buffer += chunk
+        fields = []
+
+        while self._pos < len(self._buffer) and not self._finished:
+            char = self._buffer[self._pos]
+
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                self._pos += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 0 and self._key is None and self._value_start is None:
+                        self._key = json.loads(self._buffer[self._key_start : self._pos + 1])
+                self._pos += 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 0 and self._key is None:
+                    self._key_start = self._pos
+            elif self._depth == 0 and char == ":" and self._key is not None:
+                self._value_start = self._pos + 1
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    self._emit(fields)
+                    self._finished = True
+                else:
+                    self._depth -= 1
+            elif char == "," and self._depth == 0:
+                self._emit(fields)
+
+            self._pos += 1
+
+        return fields
+
+    def _emit(self, fields: list):
+        if self._key is None or self._value_start is None:
+            return
+
+        raw_value = self._buffer[self._value_start : self._pos].strip()
+        try:
+            fields.append((self._key, json.loads(raw_value)))
+        except ValueError as e:
+            logger.warning(f"[JSON-STREAM] Bad value for '{self._key}': {e}")
+
+        self._key = None
+        self._value_start = None
@@ -1,4 +1,5 @@
 from sqlalchemy import select, delete
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
@@ -8,6 +9,12 @@ class BaseRepo:
     def __init__(self, db: AsyncSession):
         self.db = db
 
+    def insert(self):
+        # INSERT с поддержкой ON CONFLICT для текущего диалекта (Postgres, в тестах SQLite)
+        if self.db.get_bind().dialect.name == "sqlite":
+            return sqlite.insert(self.model)
+        return postgresql.insert(self.model)
+
     async def find_one(self, **filter_by):
         stmt = select(self.model).filter_by(**filter_by)
         result = await self.db.execute(stmt)
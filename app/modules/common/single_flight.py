@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """
+    Гарантирует, что для одного ключа одновременно выполняется только один пайплайн.
+
+    Внутри процесса ожидающие подписываются на общий Future, между процессами
+    (uvicorn workers, celery) лидер выбирается через Redis-лок SET NX EX.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        lock_ttl: int = 300,
+        wait_timeout: float = 120.0,
+        poll_interval: float = 0.5,
+    ):
+        self.namespace = namespace
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def _lock_key(self, key: str) -> str:
+        return f"lock:{self.namespace}:{key}"
+
+    async def run(
+        self,
+        key: str,
+        redis,
+        fn: Callable[[], Awaitable[Any]],
+        recheck: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> Any:
+        while True:
+            future = self._inflight.get(key)
+            if future is None:
+                break
+
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if not future.cancelled() or (task and task.cancelling()):
+                    raise
+                # Лидер был отменён (например, клиент отключился) — пробуем сами.
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+
+        try:
+            result = await self._run_leader(key, redis, fn, recheck)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение уже передаётся вызывающему, подписчики могут его не забрать.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _run_leader(self, key, redis, fn, recheck):
+        lock_key = self._lock_key(key)
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            acquired = await redis.set(lock_key, token, nx=True, ex=self.lock_ttl)
+            if acquired:
+                break
+
+            if time.monotonic() >= deadline:
+                logger.warning(
+                    f"[SINGLE-FLIGHT] Lock wait timeout for {lock_key}, running without lock"
+                )
+                return await fn()
+
+            await asyncio.sleep(self.poll_interval)
+
+            if recheck and not await redis.exists(lock_key):
+                result = await recheck()
+                if result is not None:
+                    return result
+
+        try:
+            # Другой процесс мог закончить пайплайн между промахом кеша и захватом лока.
+            if recheck:
+                result = await recheck()
+                if result is not None:
+                    return result
+
+            return await fn()
+        finally:
+            try:
+                await redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                logger.warning(f"[SINGLE-FLIGHT] Failed to release {lock_key}: {e}")
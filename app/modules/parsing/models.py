@@ -23,7 +23,14 @@ class ParsingRequest(Base):
     __tablename__ = "parsing_requests"
     id = Column(Integer, primary_key=True)
     place_id = Column(Integer, ForeignKey("places.id"), unique=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    # Результат задачи: у нескольких задач может быть одно и то же место
+    result_place_id = Column(
+        Integer, ForeignKey("places.id"), nullable=True, index=True
+    )
     status = Column(Enum(TaskStatus), default=TaskStatus.PENDING, index=True)
     error_message = Column(String, nullable=True)
     last_attempt = Column(DateTime, default=datetime.utcnow)
-    place = relationship("Place", back_populates="parsing_status")
+    place = relationship(
+        "Place", back_populates="parsing_status", foreign_keys=[place_id]
+    )
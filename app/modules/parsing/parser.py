@@ -1,12 +1,22 @@
-import aiohttp
 import re
-from typing import Optional
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
 from ...config import get_settings
+from ...dependencies import get_redis_client
+from ...http_clients import http_clients
+from .serpapi_client import serpapi_search
 from ..place.schemas import PlaceInfoDTO, Location, ReviewDTO
 
 settings = get_settings()
 
-SERPAPI_API_KEY = settings.serpapi_key
+# SerpApi отдаёт до 20 отзывов на страницу (кроме первой)
+REVIEWS_PAGE_SIZE = 20
+MAX_REVIEW_PAGES = 10
+
+
+def is_short_url(url: str) -> bool:
+    return "goo.gl" in url or "maps.app" in url or "bit.ly" in url
 
 
 async def resolve_short_url(short_url: str) -> str:
@@ -14,9 +24,8 @@ async def resolve_short_url(short_url: str) -> str:
     Асинхронно раскрывает короткие ссылки (goo.gl, maps.app.goo.gl)
     """
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.head(short_url, allow_redirects=True) as response:
-                return str(response.url)
+        async with http_clients.web.head(short_url, allow_redirects=True) as response:
+            return str(response.url)
     except Exception as e:
         print(f"[PARSER] Error resolving URL: {e}")
         return short_url
@@ -32,103 +41,154 @@ def extract_data_id(url: str) -> Optional[str]:
     return None
 
 
-async def parse_google_reviews(url: str, max_reviews: int = 10) -> PlaceInfoDTO:
-    print(f"[PARSER] Start SerpApi (Maps) for URL: {url}")
+@dataclass
+class ReviewPage:
+    """Одна страница google_maps_reviews: карточка места и отзывы с неё."""
 
-    place_dto = PlaceInfoDTO(
-        place_id="",
-        name="Unknown Place",
-        location=Location(lat=None, lon=None),
-        url=url,
-        reviews=[],
-        photos=[],
-    )
-
-    full_url = url
-    if "goo.gl" in url or "maps.app" in url or "bit.ly" in url:
-        full_url = await resolve_short_url(url)
+    place_info: dict
+    reviews: list[ReviewDTO] = field(default_factory=list)
+    photos: list[str] = field(default_factory=list)
 
-    data_id = extract_data_id(full_url)
 
-    if not data_id:
-        print("[PARSER] Could not extract 'data_id' (CID) from URL.")
-        return place_dto
-
-    place_dto.place_id = data_id
+def _parse_review_date(iso_date: str) -> Optional[datetime]:
+    if not iso_date:
+        return None
+    try:
+        parsed = datetime.fromisoformat(iso_date.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _review_photos(item: dict) -> list[str]:
+    photos = []
+    for img in item.get("images", []):
+        if isinstance(img, str):
+            photos.append(img)
+        elif isinstance(img, dict) and "thumbnail" in img:
+            photos.append(img["thumbnail"])
+    return photos
+
+
+async def iter_review_pages(
+    data_id: str,
+    max_reviews: int,
+    newer_than: Optional[datetime] = None,
+    bypass_cache: bool = False,
+) -> AsyncIterator[ReviewPage]:
+    """
+    Отзывы места постранично (сначала новые) по next_page_token SerpApi.
 
-    endpoint = "https://serpapi.com/search.json"
+    Останавливается, когда набрано max_reviews, страницы кончились или
+    пошли отзывы старше newer_than. Потребитель может прекратить итерацию
+    в любой момент — следующая страница запрашивается только по требованию.
+    """
     params = {
         "engine": "google_maps_reviews",
         "data_id": data_id,
-        "api_key": SERPAPI_API_KEY,
         "hl": "ru",
         "sort_by": "newestFirst",
     }
+    collected = 0
 
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(endpoint, params=params) as response:
-                if response.status != 200:
-                    print(f"[PARSER] SerpApi Error: {response.status}")
-                    return place_dto
-
-                data = await response.json()
-
+    for _ in range(MAX_REVIEW_PAGES):
+        data = await serpapi_search(params, bypass_cache=bypass_cache)
+        if data is None:
+            return
         if "error" in data:
             print(f"[PARSER] SerpApi returned error: {data['error']}")
-            return place_dto
-
-        place_info = data.get("place_info", {})
-
-        place_dto.name = place_info.get("title", "Unknown Place")
-        place_dto.address = place_info.get("address", "")
-        place_dto.rating = float(place_info.get("rating", 0.0))
-        place_dto.rating = float(place_info.get("rating", 0.0))
-        place_dto.reviews_count = int(place_info.get("reviews", 0))
-
-        # Try to get open_state from place_info (Reviews API) or map from hours if available
-        # Note: SerpApi Reviews API 'place_info' object might contain 'extensions' with open info or similar.
-        # But commonly open_state is in Local Results API.
-        # We will try to grab what we can.
-        if "hours" in place_info:
-             place_dto.open_state = str(place_info["hours"])
-        elif "open_state" in place_info:
-             place_dto.open_state = place_info["open_state"]
-
-        gps = place_info.get("gps_coordinates", {})
-        if gps:
-            place_dto.location = Location(
-                lat=gps.get("latitude"), lon=gps.get("longitude")
-            )
+            return
 
-        place_dto.photos = []
+        page = ReviewPage(place_info=data.get("place_info", {}))
+        reached_cutoff = False
+
+        for item in data.get("reviews", []):
+            iso_date = item.get("iso_date") or ""
+            review_date = _parse_review_date(iso_date)
+            if newer_than and review_date and review_date < newer_than:
+                reached_cutoff = True
+                break
 
-        raw_reviews = data.get("reviews", [])
+            if not page.photos:
+                page.photos = _review_photos(item)
 
-        for item in raw_reviews:
             snippet = item.get("snippet") or item.get("text")
+            if not snippet:
+                continue
 
-            if snippet:
-                review_dto = ReviewDTO(
+            page.reviews.append(
+                ReviewDTO(
                     author=item.get("user", {}).get("name", "Guest"),
                     rating=float(item.get("rating") or 0.0),
-                    date=item.get("date", ""),
+                    date=iso_date or item.get("date", ""),
                     text=snippet,
                 )
-                place_dto.reviews.append(review_dto)
+            )
+            collected += 1
+            if collected >= max_reviews:
+                break
 
-            if not place_dto.photos and "images" in item:
-                images_list = item.get("images", [])
-                for img in images_list:
-                    if isinstance(img, str):
-                        place_dto.photos.append(img)
-                    elif isinstance(img, dict) and "thumbnail" in img:
-                        place_dto.photos.append(img["thumbnail"])
+        yield page
 
-            if len(place_dto.reviews) >= max_reviews:
-                break
+        next_page_token = data.get("serpapi_pagination", {}).get("next_page_token")
+        if collected >= max_reviews or reached_cutoff or not next_page_token:
+            return
 
-        place_dto.photos = place_dto.photos[:5]
+        # num разрешён только со второй страницы
+        params = {
+            **params,
+            "next_page_token": next_page_token,
+            "num": min(REVIEWS_PAGE_SIZE, max_reviews - collected),
+        }
+
+
+def review_cutoff_date() -> Optional[datetime]:
+    if settings.review_max_age_days <= 0:
+        return None
+    return datetime.now(timezone.utc) - timedelta(days=settings.review_max_age_days)
+
+
+async def parse_google_reviews(
+    url: str, max_reviews: int = 10, bypass_cache: bool = False
+) -> PlaceInfoDTO:
+    print(f"[PARSER] Start SerpApi (Maps) for URL: {url}")
+
+    place_dto = PlaceInfoDTO(
+        place_id="",
+        name="Unknown Place",
+        location=Location(lat=None, lon=None),
+        url=url,
+        reviews=[],
+        photos=[],
+    )
+
+    # place_identity импортирует парсер, поэтому импорт локальный
+    from .place_identity import canonicalize_place_url
+
+    # Общий маппинг ссылка -> data_id: короткая ссылка раскрывается один раз
+    data_id = await canonicalize_place_url(url, get_redis_client())
+
+    if not data_id:
+        print("[PARSER] Could not extract 'data_id' (CID) from URL.")
+        return place_dto
+
+    place_dto.place_id = data_id
+
+    try:
+        pages = iter_review_pages(
+            data_id,
+            max_reviews,
+            newer_than=review_cutoff_date(),
+            bypass_cache=bypass_cache,
+        )
+        first_page = True
+        async for page in pages:
+            if first_page:
+                _fill_place_info(place_dto, page.place_info)
+                first_page = False
+            if not place_dto.photos:
+                place_dto.photos = page.photos[:5]
+            place_dto.reviews.extend(page.reviews)
 
         print(
             f"[PARSER] Success: {place_dto.name}, Reviews extracted: {len(place_dto.reviews)}"
@@ -141,3 +201,25 @@ async def parse_google_reviews(url: str, max_reviews: int = 10) -> PlaceInfoDTO:
         traceback.print_exc()
 
     return place_dto
+
+
+def _fill_place_info(place_dto: PlaceInfoDTO, place_info: dict):
+    place_dto.name = place_info.get("title", "Unknown Place")
+    place_dto.address = place_info.get("address", "")
+    place_dto.rating = float(place_info.get("rating", 0.0))
+    place_dto.reviews_count = int(place_info.get("reviews", 0))
+
+    # Try to get open_state from place_info (Reviews API) or map from hours if available
+    # Note: SerpApi Reviews API 'place_info' object might contain 'extensions' with open info or similar.
+    # But commonly open_state is in Local Results API.
+    # We will try to grab what we can.
+    if "hours" in place_info:
+        place_dto.open_state = str(place_info["hours"])
+    elif "open_state" in place_info:
+        place_dto.open_state = place_info["open_state"]
+
+    gps = place_info.get("gps_coordinates", {})
+    if gps:
+        place_dto.location = Location(
+            lat=gps.get("latitude"), lon=gps.get("longitude")
+        )
@@ -0,0 +1,63 @@
+from typing import Optional
+from cachetools import LRUCache
+from ...config import get_settings
+from .parser import resolve_short_url, extract_data_id, is_short_url
+
+settings = get_settings()
+
+PLACE_URL_MAP_TTL = 3600 * 24 * 30
+
+# Короткие ссылки неизменяемы: их маппинг хранится без TTL и кешируется в процессе
+_short_url_cache: LRUCache = LRUCache(maxsize=settings.place_url_local_cache_size)
+
+
+def get_place_url_map_key(url: str) -> str:
+    return f"place_url:{url}"
+
+
+def clear_place_url_cache():
+    _short_url_cache.clear()
+
+
+async def canonicalize_place_url(url: str, redis) -> Optional[str]:
+    """
+    Приводит любую вариацию ссылки на место к его data_id (google_place_id).
+    Короткие ссылки раскрываются один раз, результат хранится в Redis.
+    """
+    data_id = extract_data_id(url)
+    if data_id:
+        return data_id
+
+    short_url = is_short_url(url)
+    if short_url and url in _short_url_cache:
+        return _short_url_cache[url]
+
+    map_key = get_place_url_map_key(url)
+    cached_id = await redis.get(map_key)
+    if cached_id:
+        if short_url:
+            _short_url_cache[url] = cached_id
+        return cached_id
+
+    if not short_url:
+        return None
+
+    full_url = await resolve_short_url(url)
+    data_id = extract_data_id(full_url)
+
+    # Страница согласия или сетевая ошибка не запоминаются: в следующий раз раскроем снова
+    if data_id:
+        await remember_place_url(url, data_id, redis)
+
+    return data_id
+
+
+async def remember_place_url(url: str, data_id: str, redis):
+    if not url or not data_id:
+        return
+
+    if is_short_url(url):
+        _short_url_cache[url] = data_id
+        await redis.set(get_place_url_map_key(url), data_id)
+    else:
+        await redis.set(get_place_url_map_key(url), data_id, ex=PLACE_URL_MAP_TTL)
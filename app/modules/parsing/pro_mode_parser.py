@@ -1,14 +1,14 @@
 import time
 import math
-import aiohttp
 import asyncio
-from typing import List
+from typing import List, Tuple
 from ...config import get_settings
+from .parser import iter_review_pages
+from .serpapi_client import serpapi_search
 from ..place.schemas import PlaceInfoDTO, Location, ReviewDTO
 from ..place.repo import PlaceRepo
 
 settings = get_settings()
-SERPAPI_API_KEY = settings.serpapi_key
 
 
 def calculate_distance(lat1, lon1, lat2, lon2) -> float:
@@ -27,32 +27,48 @@ def calculate_distance(lat1, lon1, lat2, lon2) -> float:
         return 99999.0
 
 
+def snap_to_tile(lat: float, lon: float) -> Tuple[float, float]:
+    """
+    Центр ячейки сетки, в которую попадает точка. Соседние пользователи
+    получают одинаковые координаты запроса и общий кеш выдачи SerpApi.
+    """
+    step = settings.nearby_search_tile_deg
+    if step <= 0:
+        return lat, lon
+    return (
+        round((math.floor(lat / step) + 0.5) * step, 6),
+        round((math.floor(lon / step) + 0.5) * step, 6),
+    )
+
+
+def normalize_search_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
 async def find_places_nearby(
     query: str, lat: float, lon: float, limit: int = 5
 ) -> List[PlaceInfoDTO]:
     print(f"[SEARCH] Searching via SerpApi Maps: '{query}' near ({lat},{lon})")
 
     candidates = []
-    endpoint = "https://serpapi.com/search.json"
 
     params = {
         "engine": "google_maps",
-        "q": query,
+        "q": normalize_search_query(query),
         "type": "search",
         "hl": "ru",
-        "api_key": SERPAPI_API_KEY,
     }
-    
+
     if lat is not None and lon is not None:
-        params["ll"] = f"@{lat},{lon},14z"
+        # Запрос идёт по центру тайла (кешируется на тайл+запрос),
+        # а фильтр расстояния ниже считается от точных координат пользователя
+        tile_lat, tile_lon = snap_to_tile(lat, lon)
+        params["ll"] = f"@{tile_lat},{tile_lon},14z"
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(endpoint, params=params) as response:
-                if response.status != 200:
-                    print(f"[SEARCH] SerpApi Error status: {response.status}")
-                    return []
-                data = await response.json()
+        data = await serpapi_search(params)
+        if data is None:
+            return []
 
         local_results = data.get("local_results", [])
 
@@ -110,41 +126,11 @@ async def enrich_place_with_reviews(
 
     print(f"[REVIEWS] Fetching reviews for Data ID: {place_id}")
 
-    endpoint = "https://serpapi.com/search.json"
-    params = {
-        "engine": "google_maps_reviews",
-        "data_id": place_id,
-        "hl": "ru",
-        "sort_by": "newestFirst",
-        "api_key": SERPAPI_API_KEY,
-    }
-
     collected_reviews = []
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(endpoint, params=params) as response:
-                if response.status != 200:
-                    print(f"[REVIEWS] Error fetching details: {response.status}")
-                    return []
-                data = await response.json()
-
-        raw_reviews = data.get("reviews", [])
-
-        for item in raw_reviews:
-            snippet = item.get("snippet") or item.get("text")
-
-            if snippet:
-                review = ReviewDTO(
-                    author=item.get("user", {}).get("name", "Guest"),
-                    rating=float(item.get("rating") or 0.0),
-                    date=item.get("date", ""),
-                    text=snippet,
-                )
-                collected_reviews.append(review)
-
-            if len(collected_reviews) >= max_reviews:
-                break
+        async for page in iter_review_pages(place_id, max_reviews):
+            collected_reviews.extend(page.reviews)
 
         print(f"[REVIEWS] Successfully loaded {len(collected_reviews)} reviews.")
         return collected_reviews
@@ -174,13 +160,15 @@ async def search_and_parse_places(
 
     print(f"[SEARCH_AND_PARSE] Checking DB for {len(candidates)} candidates...")
 
+    cached_places = await place_repo.get_by_google_ids_with_reviews(
+        [place_dto.place_id for place_dto in candidates if place_dto.place_id]
+    )
+
     for i, place_dto in enumerate(candidates):
         if not place_dto.place_id:
             continue
 
-        cached_place = await place_repo.get_by_google_id_with_reviews(
-            place_dto.place_id
-        )
+        cached_place = cached_places.get(place_dto.place_id)
 
         if cached_place and cached_place.reviews and len(cached_place.reviews) > 0:
             print(
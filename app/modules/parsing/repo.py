@@ -0,0 +1,29 @@
+from datetime import datetime
+from sqlalchemy import update
+from ..common.repo import BaseRepo
+from .models import ParsingRequest, TaskStatus
+
+
+class ParsingRequestRepo(BaseRepo):
+    model = ParsingRequest
+
+    async def update_status(
+        self,
+        job_id: int,
+        status: TaskStatus,
+        place_id: int | None = None,
+        error_message: str | None = None,
+    ):
+        values = {
+            "status": status,
+            "error_message": error_message,
+            "last_attempt": datetime.utcnow(),
+        }
+
+        if place_id is not None:
+            values["result_place_id"] = place_id
+
+        await self.db.execute(
+            update(self.model).where(self.model.id == job_id).values(**values)
+        )
+        await self.db.flush()
@@ -0,0 +1,14 @@
+from datetime import datetime
+from pydantic import BaseModel
+from typing import Optional
+from .models import TaskStatus
+from ..analysis_result.schemas import AIResponseOut
+
+
+class AnalysisJobOut(BaseModel):
+    job_id: Optional[int] = None
+    status: TaskStatus
+    place_id: Optional[int] = None
+    error_message: Optional[str] = None
+    updated_at: Optional[datetime] = None
+    result: Optional[AIResponseOut] = None
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import logging
+from typing import Optional
+
+from ...config import get_settings
+from ...dependencies import get_redis_binary_client
+from ...http_clients import http_clients
+from ..common import cache_codec
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+SERPAPI_ENDPOINT = "https://serpapi.com/search.json"
+
+# Отзывы меняются медленнее, чем выдача поиска по карте
+SERPAPI_CACHE_TTLS = {
+    "google_maps": 3600 * 6,
+    "google_maps_reviews": 3600 * 12,
+}
+SERPAPI_DEFAULT_CACHE_TTL = 3600
+
+# Параметры, которые не влияют на ответ и не должны попадать в ключ
+_EXCLUDED_PARAMS = {"api_key", "no_cache", "output", "async"}
+
+
+def normalize_serpapi_params(params: dict) -> dict:
+    normalized = {}
+    for key, value in params.items():
+        if key in _EXCLUDED_PARAMS or value is None:
+            continue
+        normalized[key] = " ".join(str(value).split())
+    return dict(sorted(normalized.items()))
+
+
+def get_serpapi_cache_key(params: dict) -> str:
+    normalized = normalize_serpapi_params(params)
+    raw = json.dumps(normalized, ensure_ascii=False, separators=(",", ":"))
+    digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    return f"serpapi:{normalized.get('engine', 'unknown')}:{digest}"
+
+
+async def _get_cached_response(cache_key: str) -> Optional[dict]:
+    try:
+        cached = await get_redis_binary_client().get(cache_key)
+    except Exception as e:
+        logger.warning(f"[SERPAPI] Cache read failed: {e}")
+        return None
+    return cache_codec.decode(cached)
+
+
+async def _set_cached_response(cache_key: str, engine: str, data: dict):
+    ttl = SERPAPI_CACHE_TTLS.get(engine, SERPAPI_DEFAULT_CACHE_TTL)
+    try:
+        await get_redis_binary_client().set(cache_key, cache_codec.encode(data), ex=ttl)
+    except Exception as e:
+        logger.warning(f"[SERPAPI] Cache write failed: {e}")
+
+
+async def serpapi_search(params: dict, bypass_cache: bool = False) -> Optional[dict]:
+    """
+    Единая точка вызова SerpApi с кешем ответов в Redis.
+
+    Ключ — нормализованные параметры запроса без api_key, TTL зависит от engine.
+    bypass_cache=True идёт в SerpApi в обход кеша и перезаписывает запись
+    (принудительное обновление). Ошибки SerpApi не кешируются.
+    Возвращает JSON ответа или None, если запрос не удался.
+    """
+    engine = params.get("engine", "")
+    cache_key = get_serpapi_cache_key(params)
+
+    if settings.serpapi_cache_enabled and not bypass_cache:
+        cached = await _get_cached_response(cache_key)
+        if cached is not None:
+            logger.info(f"[SERPAPI] Cache hit: {engine}")
+            return cached
+
+    request_params = {**params, "api_key": settings.serpapi_key}
+    async with http_clients.serpapi.get(SERPAPI_ENDPOINT, params=request_params) as response:
+        if response.status != 200:
+            logger.warning(f"[SERPAPI] Error status: {response.status}")
+            return None
+        data = await response.json()
+
+    if "error" in data:
+        logger.warning(f"[SERPAPI] Returned error: {data['error']}")
+        return data
+
+    if settings.serpapi_cache_enabled:
+        await _set_cached_response(cache_key, engine, data)
+
+    return data
@@ -0,0 +1,93 @@
+import json
+from datetime import datetime
+from .repo import ParsingRequestRepo
+from .models import TaskStatus
+from .schemas import AnalysisJobOut
+
+JOB_REDIS_TTL = 3600 * 24
+
+
+def get_job_cache_key(job_id: int) -> str:
+    return f"parsing_job:{job_id}"
+
+
+class ParsingJobService:
+
+    def __init__(self, parsing_repo: ParsingRequestRepo, redis):
+        self.parsing_repo = parsing_repo
+        self.redis = redis
+
+    async def _mirror(self, job: AnalysisJobOut, user_id: int | None):
+        # Владелец хранится рядом со статусом, чтобы polling проверял его без БД
+        payload = {"user_id": user_id, "job": job.model_dump(mode="json")}
+        await self.redis.set(
+            get_job_cache_key(job.job_id), json.dumps(payload), ex=JOB_REDIS_TTL
+        )
+
+    async def create_job(self, user_id: int) -> AnalysisJobOut:
+
+        parsing_request = await self.parsing_repo.add(
+            status=TaskStatus.PENDING, user_id=user_id, last_attempt=datetime.utcnow()
+        )
+        await self.parsing_repo.db.commit()
+
+        job = AnalysisJobOut(
+            job_id=parsing_request.id,
+            status=TaskStatus.PENDING,
+            updated_at=parsing_request.last_attempt,
+        )
+        await self._mirror(job, user_id)
+
+        return job
+
+    async def set_status(
+        self,
+        job_id: int,
+        status: TaskStatus,
+        place_id: int | None = None,
+        error_message: str | None = None,
+    ) -> AnalysisJobOut:
+
+        await self.parsing_repo.update_status(
+            job_id=job_id,
+            status=status,
+            place_id=place_id,
+            error_message=error_message,
+        )
+        await self.parsing_repo.db.commit()
+
+        parsing_request = await self.parsing_repo.find_one(id=job_id)
+
+        job = AnalysisJobOut(
+            job_id=job_id,
+            status=status,
+            place_id=place_id,
+            error_message=error_message,
+            updated_at=datetime.utcnow(),
+        )
+        await self._mirror(job, parsing_request.user_id if parsing_request else None)
+
+        return job
+
+    async def get_job(self, job_id: int, user_id: int) -> AnalysisJobOut | None:
+        """Задача пользователя; чужие задачи не отличаются от несуществующих."""
+
+        cached_job = await self.redis.get(get_job_cache_key(job_id))
+        if cached_job:
+            payload = json.loads(cached_job)
+            if "job" in payload:
+                if payload["user_id"] != user_id:
+                    return None
+                return AnalysisJobOut.model_validate(payload["job"])
+
+        parsing_request = await self.parsing_repo.find_one(id=job_id)
+        if not parsing_request or parsing_request.user_id != user_id:
+            return None
+
+        return AnalysisJobOut(
+            job_id=parsing_request.id,
+            status=parsing_request.status,
+            place_id=parsing_request.result_place_id,
+            error_message=parsing_request.error_message,
+            updated_at=parsing_request.last_attempt,
+        )
@@ -29,13 +29,17 @@ class Place(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     description = Column(Text, nullable=True)
     photos = Column(JSON, nullable=True)
+    indexed_at = Column(DateTime, nullable=True)
 
     reviews = relationship(
         "PlaceReview", back_populates="place", cascade="all, delete-orphan"
     )
     analysis = relationship("AnalysisResult", back_populates="place", uselist=False)
     parsing_status = relationship(
-        "ParsingRequest", back_populates="place", uselist=False
+        "ParsingRequest",
+        back_populates="place",
+        uselist=False,
+        foreign_keys="ParsingRequest.place_id",
     )
     tags = relationship("PlaceTag", back_populates="place")
     favorites = relationship("Favorite", back_populates="place")
@@ -1,4 +1,5 @@
-from sqlalchemy import select
+from datetime import datetime
+from sqlalchemy import select, delete, insert, func, update
 from sqlalchemy.orm import selectinload
 from ..common.repo import BaseRepo
 from .models import Place, PlaceReview
@@ -8,20 +9,29 @@ from ..place_tag.models import PlaceTag
 class PlaceRepo(BaseRepo):
     model = Place
 
-    async def get_place_by_url_with_full_info(self, url: str):
+    async def _get_place_with_full_info(self, condition):
         query = (
             select(self.model)
             .options(
                 selectinload(self.model.analysis),
                 selectinload(self.model.tags).selectinload(PlaceTag.tag),
             )
-            .where(self.model.source_url == url)
+            .where(condition)
         )
 
         result_db = await self.db.execute(query)
-        existing_place = result_db.scalar_one_or_none()
+        return result_db.scalar_one_or_none()
+
+    async def get_place_by_url_with_full_info(self, url: str):
+        return await self._get_place_with_full_info(self.model.source_url == url)
+
+    async def get_place_by_google_id_with_full_info(self, google_id: str):
+        return await self._get_place_with_full_info(
+            self.model.google_place_id == google_id
+        )
 
-        return existing_place
+    async def get_place_by_id_with_full_info(self, place_id: int):
+        return await self._get_place_with_full_info(self.model.id == place_id)
 
     async def get_by_google_id(self, google_id: str) -> Place | None:
         return await self.find_one(google_place_id=google_id)
@@ -35,6 +45,106 @@ class PlaceRepo(BaseRepo):
         result = await self.db.execute(query)
         return result.scalar_one_or_none()
 
+    async def get_by_google_ids_with_reviews(
+        self, google_ids: list[str]
+    ) -> dict[str, Place]:
+        """
+        Места с отзывами по списку google_id: один запрос на места
+        и один (selectinload) на отзывы всех найденных мест.
+        """
+        if not google_ids:
+            return {}
+
+        query = (
+            select(self.model)
+            .options(selectinload(self.model.reviews))
+            .where(self.model.google_place_id.in_(google_ids))
+        )
+        result = await self.db.execute(query)
+        return {place.google_place_id: place for place in result.scalars().all()}
+
+    async def get_reviews_by_google_ids(
+        self, google_ids: list[str]
+    ) -> dict[str, list[PlaceReview]]:
+        """
+        Отзывы уже сохранённых мест одним запросом.
+        Места, которых нет в БД, в результат не попадают.
+        """
+        if not google_ids:
+            return {}
+
+        query = (
+            select(self.model.google_place_id, PlaceReview)
+            .outerjoin(PlaceReview, PlaceReview.place_id == self.model.id)
+            .where(self.model.google_place_id.in_(google_ids))
+        )
+        result = await self.db.execute(query)
+
+        reviews_by_google_id: dict[str, list[PlaceReview]] = {}
+        for google_id, review in result.all():
+            place_reviews = reviews_by_google_id.setdefault(google_id, [])
+            if review is not None:
+                place_reviews.append(review)
+
+        return reviews_by_google_id
+
+    async def upsert_many(
+        self, rows: list[dict], update_source_url: bool = True
+    ) -> list[Place]:
+        """
+        INSERT ... ON CONFLICT (google_place_id) DO UPDATE RETURNING
+        для пачки мест одним запросом.
+        """
+        if not rows:
+            return []
+
+        stmt = self.insert().values(rows)
+        excluded = stmt.excluded
+
+        update_columns = {
+            "name": excluded.name,
+            "address": excluded.address,
+            "google_rating": excluded.google_rating,
+            "reviews_count": excluded.reviews_count,
+            "latitude": excluded.latitude,
+            "longitude": excluded.longitude,
+            "updated_at": excluded.updated_at,
+            "description": excluded.description,
+            "photos": excluded.photos,
+            "open_state": func.coalesce(excluded.open_state, self.model.open_state),
+        }
+        if update_source_url:
+            update_columns["source_url"] = excluded.source_url
+
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["google_place_id"], set_=update_columns
+        ).returning(self.model)
+
+        result = await self.db.scalars(
+            stmt, execution_options={"populate_existing": True}
+        )
+        return list(result.all())
+
+    async def set_indexed_at(self, place_ids: list[int], indexed_at: datetime | None):
+        if not place_ids:
+            return
+        await self.db.execute(
+            update(self.model)
+            .where(self.model.id.in_(place_ids))
+            # Отметка индексации — не изменение самого места
+            .values(indexed_at=indexed_at, updated_at=self.model.updated_at)
+        )
+
 
 class ReviewRepo(BaseRepo):
     model = PlaceReview
+
+    async def insert_many(self, rows: list[dict]):
+        if rows:
+            await self.db.execute(insert(self.model).values(rows))
+
+    async def delete_by_ids(self, review_ids: list[int]):
+        if review_ids:
+            await self.db.execute(
+                delete(self.model).where(self.model.id.in_(review_ids))
+            )
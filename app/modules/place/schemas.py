@@ -42,3 +42,13 @@ class PlaceInfoDTO(BaseModel):
     photos: List[str] = []
 
     reviews: List[ReviewDTO] = []
+
+
+class ReviewSyncStats(BaseModel):
+    created: bool = False
+    added: int = 0
+    removed: int = 0
+
+    @property
+    def changed(self) -> bool:
+        return self.created or self.added > 0 or self.removed > 0
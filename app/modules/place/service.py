@@ -1,9 +1,23 @@
+import hashlib
 from datetime import datetime
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
+from ...config import get_settings
+from .models import Place, PlaceReview
 from .repo import PlaceRepo, ReviewRepo
-from .schemas import PlaceInfoDTO
+from .schemas import PlaceInfoDTO, ReviewDTO, ReviewSyncStats
+
+settings = get_settings()
 
 UPDATE_THRESHOLD_DAYS = 30
+REVIEW_RETENTION = settings.review_retention_per_place
+
+
+def review_fingerprint(author: str, text: str) -> str:
+    # Дата не участвует: SerpApi отдаёт её то относительной ("2 недели назад"),
+    # то в ISO, и один и тот же отзыв получал бы новый отпечаток
+    text_hash = hashlib.sha1(text.strip().encode("utf-8")).hexdigest()
+    raw = f"{author.strip()}\x1f{text_hash}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
 
 
 class PlaceService:
@@ -12,7 +26,14 @@ class PlaceService:
         self.place_repo = place_repo
         self.review_repo = review_repo
 
-    async def find_place_with_info(self, url: str):
+    async def find_place_with_info(self, url: str, google_place_id: str | None = None):
+
+        if google_place_id:
+            place = await self.place_repo.get_place_by_google_id_with_full_info(
+                google_id=google_place_id
+            )
+            if place:
+                return place
 
         return await self.place_repo.get_place_by_url_with_full_info(url=url)
 
@@ -38,57 +59,138 @@ class PlaceService:
     def _generate_google_url(self, place_id: str) -> str:
         return f"https://www.google.com/maps/search/?api=1&query=Google&query_place_id={place_id}"
 
-    async def save_or_update_place(self, data: PlaceInfoDTO):
-        place = await self.place_repo.get_by_google_id(data.place_id)
-
-        final_url = data.url if data.url else self._generate_google_url(data.place_id)
-
-        if not place:
-            try:
-                place = await self.place_repo.add(
-                    google_place_id=data.place_id,
-                    source_url=final_url,
-                    name=data.name,
-                    address=data.address,
-                    google_rating=data.rating,
-                    reviews_count=data.reviews_count,
-                    latitude=data.location.lat,
-                    longitude=data.location.lon,
-                    updated_at=datetime.utcnow(),
-                    description=data.description,
-                    photos=data.photos,
-                )
-                await self.place_repo.db.flush()
-
-            except IntegrityError:
-                await self.place_repo.db.rollback()
-                place = await self.place_repo.get_by_google_id(data.place_id)
-
-        if place:
-            place.name = data.name
-            place.google_rating = data.rating
-            place.address = data.address
-            place.reviews_count = data.reviews_count
-            place.latitude = data.location.lat
-            place.longitude = data.location.lon
-            place.updated_at = datetime.utcnow()
-            place.description = data.description
-            place.photos = data.photos
-
-            if data.url and place.source_url != data.url:
-                place.source_url = data.url
-
-            await self.review_repo.delete(place_id=place.id)
-
-        if data.reviews and place:
-            for rev in data.reviews:
-                await self.review_repo.add(
-                    place_id=place.id,
-                    author_name=rev.author,
-                    rating=int(rev.rating),
-                    text=rev.text,
-                    published_time=rev.date,
-                )
-
-        await self.place_repo.db.refresh(place)
-        return place
+    def _build_place_row(self, data: PlaceInfoDTO) -> dict:
+        return {
+            "google_place_id": data.place_id,
+            "source_url": data.url or self._generate_google_url(data.place_id),
+            "name": data.name,
+            "address": data.address,
+            "google_rating": data.rating,
+            "reviews_count": data.reviews_count,
+            "open_state": data.open_state,
+            "latitude": data.location.lat,
+            "longitude": data.location.lon,
+            "updated_at": datetime.utcnow(),
+            "description": data.description,
+            "photos": data.photos,
+        }
+
+    def _build_review_row(self, place_id: int, rev: ReviewDTO) -> dict:
+        return {
+            "place_id": place_id,
+            "author_name": rev.author,
+            "rating": int(rev.rating),
+            "text": rev.text,
+            "published_time": rev.date,
+            "created_at": datetime.utcnow(),
+        }
+
+    def _sync_place_reviews(
+        self,
+        place_id: int,
+        incoming: list[ReviewDTO],
+        existing: list[PlaceReview],
+    ) -> tuple[list[dict], list[int]]:
+        """
+        Возвращает строки для вставки и id отзывов для удаления.
+        Вставляются только новые отпечатки; из старых удаляются только те,
+        что выпали из окна хранения.
+        """
+        incoming_by_fp = {}
+        for rev in incoming:
+            incoming_by_fp.setdefault(review_fingerprint(rev.author, rev.text), rev)
+
+        existing_by_fp = {}
+        for row in existing:
+            fp = review_fingerprint(row.author_name or "Guest", row.text or "")
+            existing_by_fp.setdefault(fp, []).append(row)
+
+        new_rows = [
+            self._build_review_row(place_id, rev)
+            for fp, rev in incoming_by_fp.items()
+            if fp not in existing_by_fp
+        ]
+
+        removed_ids = []
+        outdated = []
+        for fp, rows in existing_by_fp.items():
+            # Дубликаты одного отзыва в БД не нужны
+            removed_ids.extend(row.id for row in rows[1:])
+            if fp not in incoming_by_fp:
+                outdated.append(rows[0])
+
+        free_slots = max(REVIEW_RETENTION - len(incoming_by_fp), 0)
+        outdated.sort(key=lambda row: row.created_at or datetime.min, reverse=True)
+        removed_ids.extend(row.id for row in outdated[free_slots:])
+
+        return new_rows, removed_ids
+
+    async def sync_places(
+        self, items: list[PlaceInfoDTO]
+    ) -> tuple[list[Place], dict[str, ReviewSyncStats]]:
+        """
+        Сохраняет пачку мест: upsert мест (по одному запросу на наличие url)
+        и инкрементальная синхронизация отзывов. Статистика по каждому месту
+        позволяет пропустить повторную индексацию, если ничего не изменилось.
+        """
+        unique_items = {data.place_id: data for data in items}
+
+        existing_reviews = await self.place_repo.get_reviews_by_google_ids(
+            list(unique_items)
+        )
+
+        # Без url оставляем уже сохранённый source_url, как и раньше
+        with_url = [data for data in unique_items.values() if data.url]
+        without_url = [data for data in unique_items.values() if not data.url]
+
+        places = await self.place_repo.upsert_many(
+            [self._build_place_row(data) for data in with_url]
+        )
+        places += await self.place_repo.upsert_many(
+            [self._build_place_row(data) for data in without_url],
+            update_source_url=False,
+        )
+
+        places_by_google_id = {place.google_place_id: place for place in places}
+
+        rows_to_insert = []
+        ids_to_delete = []
+        stats = {}
+
+        for google_id, data in unique_items.items():
+            new_rows, removed_ids = self._sync_place_reviews(
+                place_id=places_by_google_id[google_id].id,
+                incoming=data.reviews,
+                existing=existing_reviews.get(google_id, []),
+            )
+            rows_to_insert.extend(new_rows)
+            ids_to_delete.extend(removed_ids)
+
+            stats[google_id] = ReviewSyncStats(
+                created=google_id not in existing_reviews,
+                added=len(new_rows),
+                removed=len(removed_ids),
+            )
+
+        await self.review_repo.insert_many(rows_to_insert)
+        await self.review_repo.delete_by_ids(ids_to_delete)
+
+        # Вектор в Qdrant устарел, пока место не переиндексируют
+        changed_places = [
+            places_by_google_id[google_id]
+            for google_id, place_stats in stats.items()
+            if place_stats.changed
+        ]
+        await self.place_repo.set_indexed_at([place.id for place in changed_places], None)
+        for place in changed_places:
+            set_committed_value(place, "indexed_at", None)
+
+        return [places_by_google_id[data.place_id] for data in items], stats
+
+    async def save_or_update_places(self, items: list[PlaceInfoDTO]) -> list[Place]:
+        places, _ = await self.sync_places(items)
+        return places
+
+    async def save_or_update_place(self, data: PlaceInfoDTO) -> Place:
+        places = await self.save_or_update_places([data])
+        return places[0]
@@ -1,6 +1,30 @@
+from sqlalchemy import delete
 from ..common.repo import BaseRepo
 from .models import PlaceTag
 
 
 class PlaceTagRepo(BaseRepo):
     model = PlaceTag
+
+    async def replace_place_tags(self, place_id: int, confidences: dict[int, float]):
+        delete_stmt = delete(self.model).where(self.model.place_id == place_id)
+        if confidences:
+            delete_stmt = delete_stmt.where(
+                self.model.tag_id.not_in(list(confidences))
+            )
+        await self.db.execute(delete_stmt)
+
+        if not confidences:
+            return
+
+        stmt = self.insert().values(
+            [
+                {"place_id": place_id, "tag_id": tag_id, "confidence": confidence}
+                for tag_id, confidence in confidences.items()
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["place_id", "tag_id"],
+            set_={"confidence": stmt.excluded.confidence},
+        )
+        await self.db.execute(stmt)
@@ -11,3 +11,20 @@ class PlaceTagService:
         link_db = await self.place_tag_repo.find_one(place_id=place_id, tag_id=tag_id)
         if not link_db:
             await self.place_tag_repo.add(place_id=place_id, tag_id=tag_id)
+
+    async def set_place_tags(
+        self,
+        place_id: int,
+        tag_ids: list[int],
+        confidence: dict[int, float] | None = None,
+    ):
+        """
+        Приводит теги места к результату последнего анализа:
+        новые добавляются, confidence обновляется, пропавшие удаляются.
+        """
+        confidence = confidence or {}
+        confidences = {tag_id: confidence.get(tag_id, 1.0) for tag_id in tag_ids}
+
+        await self.place_tag_repo.replace_place_tags(
+            place_id=place_id, confidences=confidences
+        )
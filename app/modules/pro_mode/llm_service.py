@@ -1,10 +1,11 @@
 import json
 import logging
 import math
-from google import genai
-import httpx
 from .schemas import SearchParams, FinalResponse
 from ...config import get_settings
+from ...http_clients import http_clients
+from ...model_service.llm_gateway import llm_gateway
+from ...model_service.llm_backend import create_llm_client
 from .utils import PerformanceTimer
 
 settings = get_settings()
@@ -12,8 +13,7 @@ settings = get_settings()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-GOOGLE_API_KEY = settings.gemini_api_key
-client = genai.Client(api_key=GOOGLE_API_KEY)
+client = create_llm_client()
 
 INFERENCE_API_URL = settings.inference_api_url
 
@@ -42,7 +42,8 @@ def safe_float(val) -> float:
 async def run_gemini_inference(prompt: str) -> str:
     with PerformanceTimer(f"Gemini Inference (prompt len={len(prompt)})"):
         try:
-            response = await client.aio.models.generate_content(
+            response = await llm_gateway.generate_content(
+                client,
                 model="gemini-2.5-flash-lite",
                 contents=prompt,
                 config={"response_mime_type": "application/json"}
@@ -235,14 +236,12 @@ async def smart_rerank(
 
         with PerformanceTimer(f"Rerank API Call (documents={len(documents)})"):
             try:
-                async with httpx.AsyncClient() as client:
-                    resp = await client.post(
-                        f"{INFERENCE_API_URL}/rerank",
-                        json={"query": user_query, "documents": documents},
-                        timeout=30.0,
-                    )
-                    resp.raise_for_status()
-                    rerank_results = resp.json()
+                resp = await http_clients.inference.post(
+                    f"{INFERENCE_API_URL}/rerank",
+                    json={"query": user_query, "documents": documents},
+                )
+                resp.raise_for_status()
+                rerank_results = resp.json()
             except Exception as e:
                 logger.error(f"Rerank API Error: {e}")
                 return candidates[:top_k]
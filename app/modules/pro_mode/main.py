@@ -1,5 +1,6 @@
 import asyncio
 import logging
+from datetime import datetime
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from .llm_service import generate_search_params, smart_rerank, explain_selection
@@ -14,6 +15,33 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+async def index_places(places_dtos: list, places: list, place_repo: PlaceRepo, db):
+    """
+    Эмбеддит места без актуального вектора в Qdrant: новые, с изменившимися
+    отзывами, сохранённые через /place/analyze и те, чья индексация не удалась.
+    """
+    pending = {
+        place.id: dto
+        for dto, place in zip(places_dtos, places)
+        if place.indexed_at is None
+    }
+    logger.info(
+        f"Qdrant: {len(pending)} of {len(places_dtos)} places need embedding"
+    )
+    if not pending:
+        return
+
+    try:
+        indexed = await insert_data_to_qdrant(list(pending.values()))
+    except Exception as e:
+        logger.error(f"Qdrant indexing failed: {e}")
+        indexed = False
+
+    if indexed:
+        await place_repo.set_indexed_at(list(pending), datetime.utcnow())
+        await db.commit()
+
+
 async def get_places_by_vibe(
     user_query: UserRequest, db: AsyncSession, user_id: Optional[int] = None
 ):
@@ -68,11 +96,10 @@ async def get_places_by_vibe(
             return {"recommendations": []}
 
         with PerformanceTimer(f"Phase 3: SQL Save (count={len(places_dtos)})"):
-            for dto in places_dtos:
-                await place_service.save_or_update_place(dto)
+            places, _ = await place_service.sync_places(places_dtos)
             await db.commit()
 
-        await insert_data_to_qdrant(places_dtos)
+        await index_places(places_dtos, places, place_repo, db)
 
         with PerformanceTimer("Phase 4: Qdrant Retrieval"):
             candidates = await search_places(
@@ -1,11 +1,11 @@
 import logging
 import warnings
 import uuid
-import httpx
 from qdrant_client import AsyncQdrantClient
 from qdrant_client import models
 from qdrant_client.models import PointStruct, Distance, VectorParams
 from ...config import get_settings
+from ...http_clients import http_clients
 from ..place.schemas import PlaceInfoDTO
 from .utils import PerformanceTimer
 
@@ -35,25 +35,24 @@ async def init_vector_db():
 
 async def get_embeddings_from_api(texts: list[str]) -> list[list[float]]:
     with PerformanceTimer(f"Get Embeddings from API (count={len(texts)})"):
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{INFERENCE_API_URL}/embed",
-                    json={"texts": texts},
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data.get("vectors", [])
-            except Exception as e:
-                logging.error(f"Embedding API Error: {e}")
-                return []
+        try:
+            response = await http_clients.inference.post(
+                f"{INFERENCE_API_URL}/embed",
+                json={"texts": texts},
+            )
+            response.raise_for_status()
+            data = response.json()
+            return data.get("vectors", [])
+        except Exception as e:
+            logging.error(f"Embedding API Error: {e}")
+            return []
 
 
-async def insert_data_to_qdrant(places: list[PlaceInfoDTO]):
+async def insert_data_to_qdrant(places: list[PlaceInfoDTO]) -> bool:
+    """Возвращает True, если векторы всех мест записаны в Qdrant."""
     with PerformanceTimer(f"Insert Data to Qdrant (places={len(places)})"):
         if not places:
-            return
+            return True
 
         texts = []
         ids = []
@@ -75,7 +74,7 @@ async def insert_data_to_qdrant(places: list[PlaceInfoDTO]):
         vectors = await get_embeddings_from_api(texts)
         if not vectors:
             logging.warning("No vectors returned from API. Skipping Qdrant upsert.")
-            return
+            return False
 
         points = [
             PointStruct(
@@ -99,9 +98,10 @@ async def insert_data_to_qdrant(places: list[PlaceInfoDTO]):
 
         if not points:
             logging.warning("No points generated for Qdrant upsert.")
-            return
+            return False
 
         await qdrant.upsert(collection_name=COLLECTION_NAME, points=points)
+        return True
 
 
 async def search_places(
@@ -1,6 +1,33 @@
+from sqlalchemy import select
 from ..common.repo import BaseRepo
 from .models import Tag
 
 
 class TagRepo(BaseRepo):
     model = Tag
+
+    async def bulk_get_or_create(self, names: list[str]) -> dict[str, int]:
+        names = list(dict.fromkeys(name for name in names if name))
+        if not names:
+            return {}
+
+        stmt = (
+            self.insert()
+            .values([{"name": name} for name in names])
+            .on_conflict_do_nothing(index_elements=["name"])
+            .returning(self.model.id, self.model.name)
+        )
+        result = await self.db.execute(stmt)
+        tag_ids = {name: tag_id for tag_id, name in result.all()}
+
+        # RETURNING отдаёт только вставленные строки, существующие дочитываем
+        missing = [name for name in names if name not in tag_ids]
+        if missing:
+            result = await self.db.execute(
+                select(self.model.id, self.model.name).where(
+                    self.model.name.in_(missing)
+                )
+            )
+            tag_ids.update({name: tag_id for tag_id, name in result.all()})
+
+        return tag_ids
@@ -14,3 +14,7 @@ class TagService:
             tag = await self.tag_repo.add(name=tag_name)
 
         return tag
+
+    async def get_or_create_tags(self, tag_names: list[str]) -> dict[str, int]:
+
+        return await self.tag_repo.bulk_get_or_create(names=tag_names)
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import logging
+import uuid
+from cachetools import TTLCache
+
+from ..config import get_settings
+from ..dependencies import get_redis_client, get_redis_binary_client
+from ..modules.analysis_result.schemas import AIResponseOut
+from ..modules.common import cache_codec
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+REDIS_TTL = 3600 * 24
+STALE_REDIS_TTL = 300
+INVALIDATION_CHANNEL = "place_analysis:invalidate"
+
+# Локальный (in-process) уровень перед Redis для самых горячих мест
+_local_cache: TTLCache = TTLCache(
+    maxsize=settings.analysis_local_cache_size,
+    ttl=settings.analysis_local_cache_ttl_seconds,
+)
+_instance_id = uuid.uuid4().hex
+
+
+def get_analysis_cache_key(place_key: str) -> str:
+    return f"place_analysis:{place_key}"
+
+
+def clear_local_cache():
+    _local_cache.clear()
+
+
+async def get_cached_analysis(cache_key: str) -> AIResponseOut | None:
+    local_response = _local_cache.get(cache_key)
+    if local_response is not None:
+        return local_response
+
+    redis = get_redis_binary_client()
+    cached_data = await redis.get(cache_key)
+    if not cached_data:
+        return None
+
+    response = cache_codec.decode_model(cached_data, AIResponseOut)
+    if response is None:
+        await redis.delete(cache_key)
+        return None
+
+    logger.info(f"HIT REDIS CACHE: {cache_key}")
+    if not response.is_stale:
+        _local_cache[cache_key] = response
+
+    return response
+
+
+async def set_cached_analysis(cache_key: str, response: AIResponseOut):
+    redis = get_redis_binary_client()
+    redis_ttl = STALE_REDIS_TTL if response.is_stale else REDIS_TTL
+    await redis.set(cache_key, cache_codec.encode(response), ex=redis_ttl)
+
+    if response.is_stale:
+        _local_cache.pop(cache_key, None)
+    else:
+        _local_cache[cache_key] = response
+
+
+async def publish_invalidation(cache_key: str):
+    message = json.dumps({"key": cache_key, "origin": _instance_id})
+    await get_redis_client().publish(INVALIDATION_CHANNEL, message)
+
+
+async def invalidate_analysis(cache_key: str):
+    _local_cache.pop(cache_key, None)
+    await get_redis_binary_client().delete(cache_key)
+    await publish_invalidation(cache_key)
+
+
+async def listen_for_invalidations():
+    """
+    Слушает канал инвалидации и сбрасывает локальные копии анализов,
+    которые переписал другой воркер (uvicorn или celery).
+    """
+    while True:
+        redis = get_redis_client()
+        pubsub = redis.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            logger.info(f"Subscribed to {INVALIDATION_CHANNEL}")
+
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    payload = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    continue
+                if payload.get("origin") != _instance_id:
+                    _local_cache.pop(payload.get("key"), None)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Invalidation listener error: {e}, reconnecting...")
+            # Пока подписки нет, локальные копии могли устареть
+            _local_cache.clear()
+            await asyncio.sleep(1)
+        finally:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
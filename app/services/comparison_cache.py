@@ -0,0 +1,51 @@
+from typing import Optional
+
+from ..dependencies import get_redis_binary_client
+from ..modules.analysis_result.schemas import AIResponseOut, ComparisonData
+from ..modules.common import cache_codec
+
+COMPARISON_TTL = 3600 * 24 * 7
+
+
+def _place_key(response: AIResponseOut) -> Optional[str]:
+    place_info = response.place_info
+    if place_info.google_place_id:
+        return place_info.google_place_id
+    if place_info.id is not None:
+        return str(place_info.id)
+    return None
+
+
+def get_comparison_cache_key(
+    response_a: AIResponseOut, response_b: AIResponseOut
+) -> Optional[str]:
+    """
+    Ключ учитывает порядок мест и время анализа каждой стороны:
+    после переанализа любого места старое сравнение просто перестаёт находиться.
+
+    Порядок важен: verdict и key_differences — свободный текст, который
+    ссылается на "Place A"/"Place B", поэтому ответ для A/B нельзя
+    механически развернуть в ответ для B/A.
+    """
+    key_a, key_b = _place_key(response_a), _place_key(response_b)
+    if not key_a or not key_b or not response_a.analyzed_at or not response_b.analyzed_at:
+        return None
+
+    side_a = f"{key_a}@{response_a.analyzed_at.isoformat()}"
+    side_b = f"{key_b}@{response_b.analyzed_at.isoformat()}"
+
+    return f"place_compare:{side_a}|{side_b}"
+
+
+async def get_cached_comparison(cache_key: str) -> Optional[ComparisonData]:
+    cached_data = await get_redis_binary_client().get(cache_key)
+    comparison = cache_codec.decode_model(cached_data, ComparisonData)
+    if comparison is not None:
+        print(f"HIT COMPARISON CACHE: {cache_key}")
+    return comparison
+
+
+async def set_cached_comparison(cache_key: str, comparison: ComparisonData):
+    await get_redis_binary_client().set(
+        cache_key, cache_codec.encode(comparison), ex=COMPARISON_TTL
+    )
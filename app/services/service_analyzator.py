@@ -1,18 +1,30 @@
+import asyncio
 import json
+from typing import AsyncIterator
 from fastapi import HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from datetime import datetime, timedelta
 
+from ..config import get_settings
 from ..dependencies import get_redis_client
-from ..services.service_layer import get_ai_analysis
+from .analysis_cache import (
+    get_analysis_cache_key,
+    get_cached_analysis,
+    set_cached_analysis,
+    publish_invalidation,
+)
+from ..services.service_layer import get_ai_analysis, save_place_analysis
+from ..model_service.model import (
+    stream_place_analysis_with_gemini,
+    ANALYSIS_RESULT_FIELD,
+)
+from ..modules.parsing.parser import parse_google_reviews
+from ..modules.place.schemas import PlaceInfoDTO
 from ..modules.place.service import PlaceService
 from ..modules.place.repo import PlaceRepo, ReviewRepo
-from ..modules.tag.repo import TagRepo
-from ..modules.tag.service import TagService
-from ..modules.place_tag.repo import PlaceTagRepo
-from ..modules.place_tag.service import PlaceTagService
-from ..modules.analysis_result.repo import AnalysisRepo
-from ..modules.analysis_result.service import AnalysisService
+from ..modules.common.single_flight import SingleFlight
+from ..modules.parsing.place_identity import canonicalize_place_url
 from ..modules.analysis_result.schemas import (
     AIAnalysis,
     AIResponseOut,
@@ -22,8 +34,73 @@ from ..modules.analysis_result.schemas import (
     DetailedAttributes,
 )
 
-ANALYSIS_FRESHNESS_DAYS = 30
-REDIS_TTL = 3600 * 24
+settings = get_settings()
+
+ANALYSIS_SOFT_TTL = timedelta(days=settings.analysis_soft_ttl_days)
+ANALYSIS_HARD_TTL = timedelta(days=settings.analysis_hard_ttl_days)
+ANALYSIS_LOCK_TTL = 300
+ANALYSIS_LOCK_WAIT = 120
+
+analysis_flight = SingleFlight(
+    namespace="place_analysis",
+    lock_ttl=ANALYSIS_LOCK_TTL,
+    wait_timeout=ANALYSIS_LOCK_WAIT,
+)
+
+
+def build_response_from_place(place) -> AIResponseOut:
+    tags_list = [pt.tag.name for pt in place.tags]
+
+    ai_analysis = AIAnalysis(
+        summary=Summary(**place.analysis.summary),
+        scores=Scores(**place.analysis.scores),
+        vibe_score=place.analysis.vibe_score,
+        tags=tags_list,
+        price_level=place.analysis.price_level,
+        best_for=place.analysis.best_for or [],
+        detailed_attributes=DetailedAttributes(
+            **(place.analysis.detailed_attributes or {})
+        ),
+    )
+
+    place_info = PlaceInfo(
+        id=place.id,
+        google_place_id=place.google_place_id,
+        name=place.name,
+        google_rating=place.google_rating,
+        url=place.source_url,
+        latitude=place.latitude,
+        longitude=place.longitude,
+        description=place.description,
+        reviews_count=place.reviews_count or 0,
+        open_state=place.open_state,
+        photos=place.photos or [],
+    )
+
+    return AIResponseOut(
+        place_info=place_info,
+        ai_analysis=ai_analysis,
+        analyzed_at=place.analysis.created_at,
+    )
+
+
+async def _schedule_background_refresh(place_key: str, url: str, limit: int, redis):
+    refresh_key = f"analysis_refresh:{place_key}"
+
+    # Один фоновый рефреш на место, пока не истечёт лок
+    scheduled = await redis.set(
+        refresh_key, 1, nx=True, ex=settings.analysis_refresh_lock_seconds
+    )
+    if not scheduled:
+        return
+
+    from ..celery_app import celery
+
+    try:
+        celery.send_task("analyze_place_task", args=[url, limit])
+    except Exception as e:
+        print(f"Failed to enqueue refresh for {url}: {e}")
+        await redis.delete(refresh_key)
 
 
 async def get_or_create_place_analysis(
@@ -31,123 +108,241 @@ async def get_or_create_place_analysis(
 ) -> AIResponseOut:
 
     redis = get_redis_client()
-    cache_key = f"place_analysis:{url}"
 
-    cached_data = await redis.get(cache_key)
-    if cached_data:
-        print(f"HIT REDIS CACHE: {url}")
-        data_dict = json.loads(cached_data)
-        return AIResponseOut(**data_dict)
+    # Все вариации ссылки на одно место ведут к одному ключу (data_id)
+    google_place_id = await canonicalize_place_url(url, redis)
+    place_key = google_place_id or url
+    cache_key = get_analysis_cache_key(place_key)
 
-    place_repo = PlaceRepo(db)
-    review_repo = ReviewRepo(db)
-    place_service = PlaceService(place_repo=place_repo, review_repo=review_repo)
+    cached_response = await get_cached_analysis(cache_key)
+    if cached_response:
+        return cached_response
 
-    tag_repo = TagRepo(db)
-    tag_service = TagService(tag_repo=tag_repo)
+    # Одновременные запросы на одно место ждут результат единственного пайплайна
+    return await analysis_flight.run(
+        key=place_key,
+        redis=redis,
+        fn=lambda: _build_place_analysis(
+            url, google_place_id, db, limit, redis, cache_key
+        ),
+        recheck=lambda: get_cached_analysis(cache_key),
+    )
 
-    place_tag_repo = PlaceTagRepo(db)
-    place_tag_service = PlaceTagService(place_tag_repo=place_tag_repo)
 
-    analysis_repo = AnalysisRepo(db)
-    analysis_service = AnalysisService(analysis_repo=analysis_repo)
+async def _build_place_analysis(
+    url: str,
+    google_place_id: str | None,
+    db: AsyncSession,
+    limit: int,
+    redis,
+    cache_key: str,
+) -> AIResponseOut:
 
-    existing_place = await place_service.find_place_with_info(url=url)
+    place_repo = PlaceRepo(db)
+    review_repo = ReviewRepo(db)
+    place_service = PlaceService(place_repo=place_repo, review_repo=review_repo)
+
+    existing_place = await place_service.find_place_with_info(
+        url=url, google_place_id=google_place_id
+    )
 
     final_response = None
 
     if existing_place and existing_place.analysis:
         last_update = existing_place.analysis.created_at or datetime.min
-        is_fresh = (datetime.utcnow() - last_update).days < ANALYSIS_FRESHNESS_DAYS
+        analysis_age = datetime.utcnow() - last_update
 
-        if is_fresh:
+        if analysis_age < ANALYSIS_HARD_TTL:
             print(f"Hit Cache for URL: {url}")
-            tags_list = [pt.tag.name for pt in existing_place.tags]
-
-            ai_analysis = AIAnalysis(
-                summary=Summary(**existing_place.analysis.summary),
-                scores=Scores(**existing_place.analysis.scores),
-                vibe_score=existing_place.analysis.vibe_score,
-                tags=tags_list,
-                price_level=existing_place.analysis.price_level,
-                best_for=existing_place.analysis.best_for or [],
-                detailed_attributes=DetailedAttributes(
-                    **(existing_place.analysis.detailed_attributes or {})
-                ),
-            )
+            final_response = build_response_from_place(existing_place)
 
-            place_info = PlaceInfo(
-                id=existing_place.id,
-                google_place_id=existing_place.google_place_id,
-                name=existing_place.name,
-                google_rating=existing_place.google_rating,
-                url=existing_place.source_url,
-                latitude=existing_place.latitude,
-                longitude=existing_place.longitude,
-                description=existing_place.description,
-                reviews_count=existing_place.reviews_count or 0,
-                open_state=existing_place.open_state,
-                photos=existing_place.photos or [],
-            )
-            final_response = AIResponseOut(
-                place_info=place_info, ai_analysis=ai_analysis
-            )
+            if analysis_age >= ANALYSIS_SOFT_TTL:
+                # Stale-while-revalidate: отдаём старый анализ, обновляем в фоне
+                print(f"Analysis for {existing_place.name} is stale, refreshing in background...")
+                final_response.is_stale = True
+                await _schedule_background_refresh(
+                    place_key=google_place_id or url, url=url, limit=limit, redis=redis
+                )
         else:
             print(f"Cache expired for {existing_place.name}, reparsing...")
 
-    if not final_response:
-        try:
-            place_dto, ai_analysis_obj = await get_ai_analysis(url=url, limit=limit)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Analysis failed: {str(e)}")
-
-        saved_place = await place_service.save_or_update_place(place_dto)
-        
-        # Ensure additional fields are saved if save_or_update_place didn't catch them
-        # (Assuming save_or_update_place uses DTO to update model)
-        if hasattr(saved_place, 'open_state') and place_dto.open_state:
-             saved_place.open_state = place_dto.open_state
-             await db.commit()
-             
-        await analysis_repo.delete(place_id=saved_place.id)
-
-        await analysis_service.create_new_analysis(
-            place_id=saved_place.id,
-            summary=ai_analysis_obj.summary.model_dump(),
-            scores=ai_analysis_obj.scores.model_dump(),
-            vibe_score=ai_analysis_obj.vibe_score,
-            price_level=ai_analysis_obj.price_level,
-            best_for=ai_analysis_obj.best_for,
-            detailed_attributes=ai_analysis_obj.detailed_attributes.model_dump(),
-        )
+    if final_response:
+        await set_cached_analysis(cache_key, final_response)
+        return final_response
+
+    try:
+        place_dto, ai_analysis_obj = await get_ai_analysis(url=url, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Analysis failed: {str(e)}")
+
+    return await _store_new_analysis(url, db, cache_key, place_dto, ai_analysis_obj)
 
-        for tag_name in ai_analysis_obj.tags:
-            tag = await tag_service.create_tag_if_not_exists(tag_name=tag_name)
-            await place_tag_service.create_tag_link_if_not_exists(
-                place_id=saved_place.id, tag_id=tag.id
+
+def _place_info_from_dto(place_dto: PlaceInfoDTO, url: str, place_id=None) -> PlaceInfo:
+    return PlaceInfo(
+        id=place_id,
+        google_place_id=place_dto.place_id,
+        name=place_dto.name,
+        google_rating=place_dto.rating,
+        url=url,
+        latitude=place_dto.location.lat,
+        longitude=place_dto.location.lon,
+        description=place_dto.description,
+        reviews_count=place_dto.reviews_count,
+        open_state=place_dto.open_state,
+        photos=place_dto.photos,
+    )
+
+
+async def _store_new_analysis(
+    url: str,
+    db: AsyncSession,
+    cache_key: str,
+    place_dto: PlaceInfoDTO,
+    ai_analysis_obj: AIAnalysis,
+) -> AIResponseOut:
+
+    saved_place, new_analysis = await save_place_analysis(
+        db=db, place_dto=place_dto, ai_analysis=ai_analysis_obj
+    )
+
+    final_response = AIResponseOut(
+        place_info=_place_info_from_dto(place_dto, url, place_id=saved_place.id),
+        ai_analysis=ai_analysis_obj,
+        analyzed_at=new_analysis.created_at,
+    )
+
+    await set_cached_analysis(cache_key, final_response)
+    # Остальные воркеры должны сбросить локальную копию старого анализа
+    await publish_invalidation(cache_key)
+    return final_response
+
+
+def _sse_event(event: str, data) -> str:
+    if isinstance(data, BaseModel):
+        payload = data.model_dump_json()
+    else:
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def stream_place_analysis(
+    url: str, limit: int, session_factory: async_sessionmaker
+) -> AsyncIterator[str]:
+    """
+    SSE-вариант get_or_create_place_analysis.
+
+    События: place_info (сразу после парсинга SerpApi), field (каждое поле
+    анализа по мере генерации), result (итоговый AIResponseOut), error.
+    Готовые анализы (кеш, БД) отдаются сразу place_info + result.
+    """
+    # Стрим живёт дольше запроса, поэтому сессия своя, а не из get_db
+    async with session_factory() as db:
+        async for event in _stream_place_analysis(url, db, limit):
+            yield event
+
+
+async def _find_ready_analysis(
+    url: str, google_place_id: str | None, cache_key: str, db: AsyncSession, limit: int
+) -> AIResponseOut | None:
+    ready_response = await get_cached_analysis(cache_key)
+    if ready_response is not None:
+        return ready_response
+
+    place_service = PlaceService(PlaceRepo(db), ReviewRepo(db))
+    existing_place = await place_service.find_place_with_info(
+        url=url, google_place_id=google_place_id
+    )
+    if existing_place and existing_place.analysis:
+        last_update = existing_place.analysis.created_at or datetime.min
+        if datetime.utcnow() - last_update < ANALYSIS_HARD_TTL:
+            # Обычный путь сам разберётся со stale-while-revalidate
+            return await get_or_create_place_analysis(url=url, db=db, limit=limit)
+
+    return None
+
+
+async def get_ready_place_analysis(
+    url: str, db: AsyncSession, limit: int
+) -> AIResponseOut | None:
+    """Готовый анализ из кеша или БД (не старше hard TTL) без запуска пайплайна."""
+    google_place_id = await canonicalize_place_url(url, get_redis_client())
+    cache_key = get_analysis_cache_key(google_place_id or url)
+    return await _find_ready_analysis(url, google_place_id, cache_key, db, limit)
+
+
+async def _stream_place_analysis(
+    url: str, db: AsyncSession, limit: int
+) -> AsyncIterator[str]:
+    redis = get_redis_client()
+
+    google_place_id = await canonicalize_place_url(url, redis)
+    place_key = google_place_id or url
+    cache_key = get_analysis_cache_key(place_key)
+
+    ready_response = await _find_ready_analysis(
+        url, google_place_id, cache_key, db, limit
+    )
+
+    if ready_response is not None:
+        yield _sse_event("place_info", ready_response.place_info)
+        yield _sse_event("result", ready_response)
+        return
+
+    events: asyncio.Queue[str | None] = asyncio.Queue()
+    streamed = False
+
+    async def build() -> AIResponseOut:
+        nonlocal streamed
+        streamed = True
+
+        place_dto = await parse_google_reviews(url, limit)
+        if not place_dto.place_id:
+            raise HTTPException(
+                status_code=404, detail="Could not find the place by this URL"
             )
 
-        await db.commit()
-
-        place_info_out = PlaceInfo(
-            id=saved_place.id,
-            google_place_id=place_dto.place_id,
-            name=place_dto.name,
-            google_rating=place_dto.rating,
-            url=url,
-            latitude=place_dto.location.lat,
-            longitude=place_dto.location.lon,
-            description=place_dto.description,
-            reviews_count=place_dto.reviews_count,
-            open_state=place_dto.open_state,
-            photos=place_dto.photos,
+        events.put_nowait(_sse_event("place_info", _place_info_from_dto(place_dto, url)))
+
+        ai_analysis_obj = None
+        async for field, value in stream_place_analysis_with_gemini(place_dto):
+            if field == ANALYSIS_RESULT_FIELD:
+                ai_analysis_obj = value
+            else:
+                events.put_nowait(_sse_event("field", {"name": field, "value": value}))
+
+        return await _store_new_analysis(
+            url, db, cache_key, place_dto, ai_analysis_obj
         )
 
-        final_response = AIResponseOut(
-            place_info=place_info_out, ai_analysis=ai_analysis_obj
+    # Тот же single-flight, что и у обычного анализа: лидер стримит поля,
+    # остальные запросы на это место получают только итоговый результат
+    flight = asyncio.create_task(
+        analysis_flight.run(
+            key=place_key,
+            redis=redis,
+            fn=build,
+            recheck=lambda: get_cached_analysis(cache_key),
         )
+    )
+    flight.add_done_callback(lambda _: events.put_nowait(None))
 
-    if final_response:
-        await redis.set(cache_key, final_response.model_dump_json(), ex=REDIS_TTL)
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+    finally:
+        # Клиент отключился — пайплайн отменяется, как и раньше без single-flight
+        flight.cancel()
 
-    return final_response
+    try:
+        final_response = flight.result()
+    except HTTPException as e:
+        yield _sse_event("error", {"detail": e.detail})
+        return
+    except Exception as e:
+        yield _sse_event("error", {"detail": f"Analysis failed: {str(e)}"})
+        return
+
+    if not streamed:
+        yield _sse_event("place_info", final_response.place_info)
+    yield _sse_event("result", final_response)
@@ -0,0 +1,63 @@
+import asyncio
+from typing import AsyncIterator, List
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from .service_analyzator import get_or_create_place_analysis
+from ..model_service.llm_gateway import LLMPriority, llm_priority
+from ..modules.analysis_result.schemas import BatchAnalyzeItem
+
+
+async def _analyze_batch_item(
+    index: int,
+    url: str,
+    limit: int,
+    semaphore: asyncio.Semaphore,
+    session_factory: async_sessionmaker,
+) -> BatchAnalyzeItem:
+    async with semaphore:
+        try:
+            # У каждой задачи своя сессия: AsyncSession нельзя делить между корутинами.
+            # Батч не должен вытеснять одиночные интерактивные запросы из очереди Gemini
+            with llm_priority(LLMPriority.DEFAULT):
+                async with session_factory() as db:
+                    result = await get_or_create_place_analysis(
+                        url=url, db=db, limit=limit
+                    )
+            return BatchAnalyzeItem(index=index, url=url, status="ok", result=result)
+        except HTTPException as e:
+            return BatchAnalyzeItem(
+                index=index, url=url, status="error", detail=str(e.detail)
+            )
+        except Exception as e:
+            print(f"[BATCH] Analysis failed for {url}: {e}")
+            return BatchAnalyzeItem(index=index, url=url, status="error", detail=str(e))
+
+
+async def stream_batch_place_analysis(
+    urls: List[str],
+    limit: int,
+    concurrency: int,
+    session_factory: async_sessionmaker,
+) -> AsyncIterator[str]:
+    """
+    Анализирует список мест с ограниченным параллелизмом и отдаёт
+    NDJSON-строки по мере готовности, не дожидаясь медленных мест.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    tasks = [
+        asyncio.create_task(
+            _analyze_batch_item(index, url, limit, semaphore, session_factory)
+        )
+        for index, url in enumerate(urls)
+    ]
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            yield item.model_dump_json() + "\n"
+    finally:
+        # Клиент отключился — не продолжаем тратить квоту SerpApi/Gemini
+        for task in tasks:
+            task.cancel()
@@ -2,7 +2,12 @@ from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 import asyncio
 from .service_analyzator import get_or_create_place_analysis
-from ..model_service.model import compare_places_with_gemini
+from ..model_service.model import compare_places_with_gemini, COMPARISON_ERROR_VERDICT
+from .comparison_cache import (
+    get_comparison_cache_key,
+    get_cached_comparison,
+    set_cached_comparison,
+)
 from ..modules.analysis_result.schemas import CompareResponse
 from app.modules.pro_mode.utils import PerformanceTimer
 
@@ -28,12 +33,22 @@ async def compare_places_service(
             # Fallback to sequential if something breaks, or just raise
             raise HTTPException(status_code=400, detail=f"Error fetching places for comparison: {str(e)}")
 
-    comparison_data = await compare_places_with_gemini(
-        analysis_a=response_a.ai_analysis,
-        analysis_b=response_b.ai_analysis,
-        name_a=response_a.place_info.name,
-        name_b=response_b.place_info.name,
-    )
+    cache_key = get_comparison_cache_key(response_a, response_b)
+
+    comparison_data = None
+    if cache_key:
+        comparison_data = await get_cached_comparison(cache_key)
+
+    if comparison_data is None:
+        comparison_data = await compare_places_with_gemini(
+            analysis_a=response_a.ai_analysis,
+            analysis_b=response_b.ai_analysis,
+            name_a=response_a.place_info.name,
+            name_b=response_b.place_info.name,
+        )
+
+        if cache_key and comparison_data.verdict != COMPARISON_ERROR_VERDICT:
+            await set_cached_comparison(cache_key, comparison_data)
 
     return CompareResponse(
         place_a=response_a.place_info,
@@ -0,0 +1,61 @@
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..dependencies import get_redis_client
+from .service_analyzator import build_response_from_place, get_ready_place_analysis
+from ..modules.parsing.models import TaskStatus
+from ..modules.parsing.repo import ParsingRequestRepo
+from ..modules.parsing.schemas import AnalysisJobOut
+from ..modules.parsing.service import ParsingJobService
+from ..modules.place.repo import PlaceRepo
+
+
+async def submit_analysis_job(
+    url: str, limit: int, user_id: int, db: AsyncSession
+) -> AnalysisJobOut:
+    from ..celery_app import celery
+
+    # Готовый анализ отдаём сразу, без задачи в очереди
+    ready_response = await get_ready_place_analysis(url=url, db=db, limit=limit)
+    if ready_response is not None:
+        return AnalysisJobOut(
+            status=TaskStatus.COMPLETED,
+            place_id=ready_response.place_info.id,
+            updated_at=ready_response.analyzed_at,
+            result=ready_response,
+        )
+
+    job_service = ParsingJobService(ParsingRequestRepo(db), get_redis_client())
+    job = await job_service.create_job(user_id)
+
+    try:
+        celery.send_task(
+            "analyze_place_task", args=[url, limit], kwargs={"job_id": job.job_id}
+        )
+    except Exception as e:
+        print(f"Failed to enqueue analysis job {job.job_id}: {e}")
+        await job_service.set_status(
+            job.job_id, TaskStatus.FAILED, error_message="Очередь задач недоступна"
+        )
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Не удалось поставить анализ в очередь",
+        )
+
+    return job
+
+
+async def get_analysis_job(job_id: int, user_id: int, db: AsyncSession) -> AnalysisJobOut:
+
+    job_service = ParsingJobService(ParsingRequestRepo(db), get_redis_client())
+    job = await job_service.get_job(job_id, user_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+
+    if job.status == TaskStatus.COMPLETED and job.place_id:
+        place = await PlaceRepo(db).get_place_by_id_with_full_info(job.place_id)
+        if place and place.analysis:
+            job.result = build_response_from_place(place)
+
+    return job
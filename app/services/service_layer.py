@@ -1,14 +1,83 @@
-from app.model_service.model import analyze_place_with_gemini
+import asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.model_service.model import (
+    analyze_place_with_gemini,
+    analyze_places_with_gemini_batch,
+)
 from app.modules.parsing.parser import parse_google_reviews
 from app.modules.place.schemas import PlaceInfoDTO
+from app.modules.place.models import Place
+from app.modules.place.repo import PlaceRepo, ReviewRepo
+from app.modules.place.service import PlaceService
+from app.modules.tag.repo import TagRepo
+from app.modules.tag.service import TagService
+from app.modules.place_tag.repo import PlaceTagRepo
+from app.modules.place_tag.service import PlaceTagService
+from app.modules.analysis_result.models import AnalysisResult
+from app.modules.analysis_result.repo import AnalysisRepo
+from app.modules.analysis_result.service import AnalysisService
 from app.modules.analysis_result.schemas import AIAnalysis
 
 
-async def get_ai_analysis(url: str, limit: int) -> tuple[PlaceInfoDTO, AIAnalysis]:
+async def get_ai_analysis(
+    url: str, limit: int, bypass_cache: bool = False
+) -> tuple[PlaceInfoDTO, AIAnalysis]:
 
-    place_dto = await parse_google_reviews(url, limit)
+    place_dto = await parse_google_reviews(url, limit, bypass_cache=bypass_cache)
     ai_analysis_result = await analyze_place_with_gemini(place_dto)
 
     print(f"AI Analysis завершен!. Vibe: {ai_analysis_result.vibe_score}")
 
     return place_dto, ai_analysis_result
+
+
+async def get_ai_analyses_batch(
+    urls: list[str], limit: int, bypass_cache: bool = False
+) -> list[tuple[PlaceInfoDTO, AIAnalysis]]:
+    """
+    Пакетный вариант get_ai_analysis для фоновых обновлений:
+    парсим места параллельно, анализируем одним запросом к Gemini.
+    """
+    place_dtos = await asyncio.gather(
+        *[parse_google_reviews(url, limit, bypass_cache=bypass_cache) for url in urls]
+    )
+    ai_analyses = await analyze_places_with_gemini_batch(list(place_dtos))
+
+    return list(zip(place_dtos, ai_analyses))
+
+
+async def save_place_analysis(
+    db: AsyncSession, place_dto: PlaceInfoDTO, ai_analysis: AIAnalysis
+) -> tuple[Place, AnalysisResult]:
+    """
+    Сохраняет место, его анализ и теги одной транзакцией.
+    Общий путь для API и Celery.
+    """
+    place_service = PlaceService(PlaceRepo(db), ReviewRepo(db))
+    tag_service = TagService(TagRepo(db))
+    place_tag_service = PlaceTagService(PlaceTagRepo(db))
+    analysis_repo = AnalysisRepo(db)
+    analysis_service = AnalysisService(analysis_repo)
+
+    saved_place = await place_service.save_or_update_place(place_dto)
+
+    await analysis_repo.delete(place_id=saved_place.id)
+
+    new_analysis = await analysis_service.create_new_analysis(
+        place_id=saved_place.id,
+        summary=ai_analysis.summary.model_dump(),
+        scores=ai_analysis.scores.model_dump(),
+        vibe_score=ai_analysis.vibe_score,
+        price_level=ai_analysis.price_level,
+        best_for=ai_analysis.best_for,
+        detailed_attributes=ai_analysis.detailed_attributes.model_dump(),
+    )
+
+    tag_ids = await tag_service.get_or_create_tags(ai_analysis.tags)
+    await place_tag_service.set_place_tags(
+        place_id=saved_place.id, tag_ids=list(tag_ids.values())
+    )
+
+    await db.commit()
+
+    return saved_place, new_analysis
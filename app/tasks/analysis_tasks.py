@@ -1,64 +1,71 @@
-import asyncio
 import logging
 from ..celery_app import celery
+from .worker_loop import run_async
+from ..model_service.llm_gateway import LLMPriority, llm_priority
+from ..model_service.model import is_empty_analysis
 from ..database import AsyncLocalSession
-from ..services.service_layer import get_ai_analysis
-from ..modules.place.service import PlaceService
-from ..modules.place.repo import PlaceRepo, ReviewRepo
-from ..modules.tag.repo import TagRepo
-from ..modules.tag.service import TagService
-from ..modules.place_tag.repo import PlaceTagRepo
-from ..modules.place_tag.service import PlaceTagService
-from ..modules.analysis_result.repo import AnalysisRepo
-from ..modules.analysis_result.service import AnalysisService
+from ..services.service_layer import (
+    get_ai_analysis,
+    get_ai_analyses_batch,
+    save_place_analysis,
+)
+from ..modules.parsing.models import TaskStatus
+from ..modules.parsing.repo import ParsingRequestRepo
+from ..modules.parsing.service import ParsingJobService
 from ..dependencies import get_redis_client
+from ..services.analysis_cache import get_analysis_cache_key, invalidate_analysis
 
 logger = logging.getLogger(__name__)
 
 
 @celery.task(name="analyze_place_task")
-def analyze_place_task(url: str, limit: int):
-    return asyncio.run(_process_analysis_async(url, limit))
+def analyze_place_task(url: str, limit: int, job_id: int | None = None):
+    # Задачу с job_id ждёт пользователь, без него — это фоновое обновление
+    priority = LLMPriority.DEFAULT if job_id else LLMPriority.BACKGROUND
+    with llm_priority(priority):
+        return run_async(_process_analysis_async(url, limit, job_id))
 
 
-async def _process_analysis_async(url: str, limit: int):
+async def _process_analysis_async(url: str, limit: int, job_id: int | None = None):
     logger.info(f"WORKER: Начал обновление для {url}")
 
     async with AsyncLocalSession() as db:
+        redis = get_redis_client()
+        job_service = ParsingJobService(ParsingRequestRepo(db), redis)
+
         try:
-            place_dto, ai_analysis_obj = await get_ai_analysis(url=url, limit=limit)
-
-            place_service = PlaceService(PlaceRepo(db), ReviewRepo(db))
-            tag_service = TagService(TagRepo(db))
-            place_tag_service = PlaceTagService(PlaceTagRepo(db))
-            analysis_repo = AnalysisRepo(db)
-            analysis_service = AnalysisService(analysis_repo)
-
-            saved_place = await place_service.save_or_update_place(place_dto)
-
-            await analysis_repo.delete(place_id=saved_place.id)
-
-            await analysis_service.create_new_analysis(
-                place_id=saved_place.id,
-                summary=ai_analysis_obj.summary.model_dump(),
-                scores=ai_analysis_obj.scores.model_dump(),
-                vibe_score=ai_analysis_obj.vibe_score,
-                price_level=ai_analysis_obj.price_level,
-                best_for=ai_analysis_obj.best_for,
-                detailed_attributes=ai_analysis_obj.detailed_attributes.model_dump(),
+            if job_id:
+                await job_service.set_status(job_id, TaskStatus.PROCESSING)
+
+            # Фоновое обновление должно видеть свежие отзывы, а не кеш SerpApi
+            place_dto, ai_analysis_obj = await get_ai_analysis(
+                url=url, limit=limit, bypass_cache=not job_id
             )
 
-            for tag_name in ai_analysis_obj.tags:
-                tag = await tag_service.create_tag_if_not_exists(tag_name=tag_name)
-                await place_tag_service.create_tag_link_if_not_exists(
-                    place_id=saved_place.id, tag_id=tag.id
+            if not place_dto.place_id or is_empty_analysis(ai_analysis_obj):
+                # Нечего сохранять: пустое место или заглушка затёрли бы рабочий анализ
+                error_message = (
+                    "Место по ссылке не найдено"
+                    if not place_dto.place_id
+                    else "Не удалось проанализировать место"
                 )
+                logger.warning(f"WORKER: Пропускаю {url}: {error_message}")
+                if job_id:
+                    await job_service.set_status(
+                        job_id, TaskStatus.FAILED, error_message=error_message
+                    )
+                return f"Skipped {url}"
+
+            saved_place, _ = await save_place_analysis(
+                db=db, place_dto=place_dto, ai_analysis=ai_analysis_obj
+            )
 
-            await db.commit()
+            await invalidate_analysis(get_analysis_cache_key(place_dto.place_id))
 
-            redis = get_redis_client()
-            cache_key = f"place_analysis:{url}"
-            await redis.delete(cache_key)
+            if job_id:
+                await job_service.set_status(
+                    job_id, TaskStatus.COMPLETED, place_id=saved_place.id
+                )
 
             logger.info(f"WORKER: Успешно обновил {url}")
             return f"Updated {saved_place.name}"
@@ -66,4 +73,47 @@ async def _process_analysis_async(url: str, limit: int):
         except Exception as e:
             logger.error(f"WORKER ERROR: {e}")
             await db.rollback()
+            if job_id:
+                await job_service.set_status(
+                    job_id, TaskStatus.FAILED, error_message=str(e)
+                )
             raise e
+
+
+@celery.task(name="analyze_places_batch_task")
+def analyze_places_batch_task(urls: list[str], limit: int):
+    with llm_priority(LLMPriority.BACKGROUND):
+        return run_async(_process_batch_analysis_async(urls, limit))
+
+
+async def _process_batch_analysis_async(urls: list[str], limit: int):
+    logger.info(f"WORKER: Начал пакетное обновление {len(urls)} мест")
+
+    results = await get_ai_analyses_batch(urls=urls, limit=limit, bypass_cache=True)
+
+    updated = 0
+    for url, (place_dto, ai_analysis_obj) in zip(urls, results):
+        if not place_dto.place_id:
+            # Парсинг не удался — не затираем старый анализ пустым
+            logger.warning(f"WORKER: Пропускаю {url}, нет данных от парсера")
+            continue
+
+        if is_empty_analysis(ai_analysis_obj):
+            # Gemini не ответил или анализировать нечего — оставляем старый анализ
+            logger.warning(f"WORKER: Пропускаю {url}, анализ не получен")
+            continue
+
+        # Своя сессия на место: ошибка одного не откатывает остальные
+        async with AsyncLocalSession() as db:
+            try:
+                await save_place_analysis(
+                    db=db, place_dto=place_dto, ai_analysis=ai_analysis_obj
+                )
+                await invalidate_analysis(get_analysis_cache_key(place_dto.place_id))
+                updated += 1
+            except Exception as e:
+                logger.error(f"WORKER ERROR ({url}): {e}")
+                await db.rollback()
+
+    logger.info(f"WORKER: Пакетно обновлено {updated} из {len(urls)} мест")
+    return f"Updated {updated} of {len(urls)} places"
@@ -8,7 +8,8 @@ from ..database import AsyncLocalSession
 from ..modules.place.models import Place
 from ..modules.parsing.models import ParsingRequest
 from ..modules.analysis_result.models import AnalysisResult
-from .analysis_tasks import analyze_place_task
+from .analysis_tasks import analyze_places_batch_task
+from .worker_loop import run_async
 from ..config import get_settings
 
 settings = get_settings()
@@ -46,34 +47,37 @@ def backup_database_task():
 @celery.task(name="refresh_outdated_analysis_task")
 def refresh_outdated_analysis_task():
     """
-    Находит места, которые анализировались более 30 дней назад,
+    Находит места, анализ которых старше analysis_soft_ttl_days,
     и запускает их переанализ.
     """
-    import asyncio
-
-    return asyncio.run(_find_and_refresh_places())
+    return run_async(_find_and_refresh_places())
 
 
 async def _find_and_refresh_places():
     logger.info("Checking for outdated analyses...")
 
-    threshold_date = datetime.utcnow() - timedelta(days=30)
+    threshold_date = datetime.utcnow() - timedelta(days=settings.analysis_soft_ttl_days)
 
     async with AsyncLocalSession() as db:
         query = (
             select(Place)
             .join(Place.analysis)
             .where(AnalysisResult.created_at < threshold_date)
-            .limit(5)
+            # Сначала самые старые анализы, иначе лимит каждый раз берёт одни и те же места
+            .order_by(AnalysisResult.created_at, Place.id)
+            .limit(settings.analysis_refresh_places_per_run)
         )
 
         result = await db.execute(query)
         places = result.scalars().all()
 
-        count = 0
-        for place in places:
-            logger.info(f"Re-queueing analysis for: {place.name}")
-            analyze_place_task.delay(place.source_url, limit=5)
-            count += 1
+    urls = [place.source_url for place in places if place.source_url]
+    batch_size = settings.gemini_batch_size
+
+    # Фоновому обновлению задержка не важна: несколько мест на один запрос к Gemini
+    for i in range(0, len(urls), batch_size):
+        batch = urls[i : i + batch_size]
+        logger.info(f"Re-queueing analysis batch: {batch}")
+        analyze_places_batch_task.delay(batch, limit=5)
 
-    logger.info(f"Queued {count} places for refresh.")
+    logger.info(f"Queued {len(urls)} places for refresh.")
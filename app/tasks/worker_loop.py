@@ -0,0 +1,45 @@
+import asyncio
+import logging
+from typing import Any, Coroutine, Optional
+from celery.signals import worker_process_init, worker_process_shutdown
+
+from ..http_clients import http_clients
+
+logger = logging.getLogger(__name__)
+
+# Один event loop на процесс воркера: пулы соединений (HTTP, Redis, asyncpg)
+# живут между задачами, а не создаются заново в каждом asyncio.run()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+        _loop.run_until_complete(http_clients.start())
+    return _loop
+
+
+def run_async(coro: Coroutine) -> Any:
+    return _get_loop().run_until_complete(coro)
+
+
+@worker_process_init.connect
+def _init_worker_loop(**kwargs):
+    global _loop
+    # Loop родительского процесса после fork использовать нельзя
+    _loop = None
+    _get_loop()
+    logger.info("WORKER: event loop и HTTP-клиенты готовы")
+
+
+@worker_process_shutdown.connect
+def _shutdown_worker_loop(**kwargs):
+    global _loop
+    if _loop is None or _loop.is_closed():
+        return
+
+    _loop.run_until_complete(http_clients.close())
+    _loop.close()
+    _loop = None
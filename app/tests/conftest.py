@@ -6,8 +6,10 @@ from sqlalchemy.pool import StaticPool
 from unittest.mock import AsyncMock, MagicMock
 
 from app.database import Base
-from app.dependencies import get_db, get_redis_client
+from app.dependencies import get_db, get_redis_client, get_session_factory
 from app.main import app
+from app.services.analysis_cache import clear_local_cache
+from app.modules.parsing.place_identity import clear_place_url_cache
 from app.security import hash_password, create_access_token
 
 from app.modules.user.models import User
@@ -52,6 +54,49 @@ def mock_redis_global(mocker):
     return mock_redis_instance
 
 
+class RedisStore(dict):
+    """Содержимое Redis-заглушки; в ttls — ex последней записи по ключу."""
+
+    def __init__(self):
+        super().__init__()
+        self.ttls = {}
+
+
+@pytest.fixture
+def redis_store(mock_redis_global):
+    """Превращает mock_redis_global в хранилище: set пишет в словарь, get читает."""
+
+    store = RedisStore()
+
+    async def fake_set(key, value, ex=None, nx=False):
+        if nx and key in store:
+            return None
+        store[key] = value
+        store.ttls[key] = ex
+        return True
+
+    mock_redis_global.get.side_effect = lambda key: store.get(key)
+    mock_redis_global.set.side_effect = fake_set
+    return store
+
+
+@pytest.fixture(autouse=True)
+def clear_analysis_local_cache():
+    clear_local_cache()
+    clear_place_url_cache()
+    yield
+    clear_local_cache()
+    clear_place_url_cache()
+
+
+@pytest.fixture(autouse=True)
+def isolated_photo_cache(tmp_path, monkeypatch):
+    from app.model_service.photo_cache import photo_cache
+
+    monkeypatch.setattr(photo_cache, "directory", tmp_path / "photo_cache")
+    return photo_cache
+
+
 @pytest.fixture(autouse=True, scope="function")
 async def prepare_database():
     async with test_async_engine.begin() as conn:
@@ -67,12 +112,18 @@ async def db_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+@pytest.fixture
+def session_factory() -> async_sessionmaker:
+    return TestAsyncLocalSession
+
+
 @pytest.fixture(scope="function")
 async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
     async def override_get_db():
         yield db_session
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: TestAsyncLocalSession
 
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
@@ -0,0 +1,233 @@
+import asyncio
+import pytest
+
+from app.modules.place.schemas import PlaceInfo, ReviewDTO
+from app.modules.analysis_result.schemas import (
+    AIAnalysis,
+    AIResponseOut,
+    DetailedAttributes,
+    Scores,
+    Summary,
+)
+
+
+def test_cache_codec_roundtrip_and_legacy_entries():
+    from app.modules.common import cache_codec
+
+    response = AIResponseOut(
+        place_info=PlaceInfo(name="Codec Coffee", url="https://maps.google.com/?q=codec"),
+        ai_analysis=AIAnalysis(
+            summary=Summary(verdict="Уютно " * 300, pros=[], cons=[]),
+            scores=Scores(food=8, service=9, atmosphere=10, value=9),
+            vibe_score=92,
+            tags=["cozy"],
+            price_level="$$",
+            best_for=["work"],
+            detailed_attributes=DetailedAttributes(has_wifi=True),
+        ),
+    )
+
+    encoded = cache_codec.encode(response)
+    assert encoded.startswith(cache_codec.CODEC_MAGIC)
+    assert len(encoded) < len(response.model_dump_json().encode("utf-8"))
+    assert cache_codec.decode_model(encoded, AIResponseOut) == response
+
+    legacy = response.model_dump_json()
+    assert cache_codec.decode_model(legacy, AIResponseOut) == response
+
+    unknown_version = cache_codec.CODEC_MAGIC + bytes((99, 0)) + b"{}"
+    assert cache_codec.decode(unknown_version) is None
+
+
+@pytest.mark.anyio
+async def test_download_images_concurrent_capped_and_downscaled(mocker):
+    """Фото качаются параллельно, слишком большие отбрасываются, остальные уменьшаются."""
+
+    import io
+    import httpx
+    from PIL import Image
+    from app.model_service import model
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (2000, 1000), "red").save(buffer, format="JPEG")
+    jpeg_bytes = buffer.getvalue()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/huge.jpg":
+            return httpx.Response(200, content=b"0" * (model.MAX_IMAGE_BYTES + 1))
+        if request.url.path == "/missing.jpg":
+            return httpx.Response(404)
+        return httpx.Response(200, content=jpeg_bytes)
+
+    mocker.patch.object(
+        model,
+        "http_clients",
+        mocker.Mock(images=httpx.AsyncClient(transport=httpx.MockTransport(handler))),
+    )
+
+    images = await model.download_images(
+        [
+            "http://img.test/ok.jpg",
+            "http://img.test/huge.jpg",
+            "http://img.test/missing.jpg",
+        ]
+    )
+
+    assert len(images) == 1
+    assert max(images[0].size) == model.IMAGE_MAX_SIDE
+
+
+@pytest.mark.anyio
+async def test_download_images_served_from_photo_cache(isolated_photo_cache, mocker):
+    """Повторная загрузка того же фото идёт с диска, без сети."""
+
+    import io
+    import os
+    import time
+    import httpx
+    from PIL import Image
+    from app.model_service import model
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (1200, 800), "blue").save(buffer, format="JPEG")
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(str(request.url))
+        return httpx.Response(200, content=buffer.getvalue())
+
+    mocker.patch.object(
+        model,
+        "http_clients",
+        mocker.Mock(images=httpx.AsyncClient(transport=httpx.MockTransport(handler))),
+    )
+
+    url = "http://img.test/cached.jpg"
+    await model.download_images([url])
+    images = await model.download_images([url])
+
+    assert requested == [url]
+    assert max(images[0].size) == model.IMAGE_MAX_SIDE
+
+    # Срок жизни считается от записи: недавнее чтение (atime) его не продлевает
+    cached_path = isolated_photo_cache._path_for(url)
+    expired = cached_path.stat().st_mtime - isolated_photo_cache.ttl_seconds - 1
+    os.utime(cached_path, (time.time(), expired))
+    assert isolated_photo_cache.get(url) is None
+    assert not cached_path.exists()
+
+    # Просроченный файл удаляется и при проверке размера кеша
+    await model.download_images([url])
+    os.utime(cached_path, (time.time(), expired))
+    isolated_photo_cache.evict()
+    assert not cached_path.exists()
+
+
+@pytest.mark.anyio
+async def test_http_clients_reused_within_event_loop():
+    from app.http_clients import HttpClients
+
+    clients = HttpClients()
+    await clients.start()
+
+    assert clients.serpapi is clients.serpapi
+    assert clients.inference is clients.inference
+    assert clients.images._transport is clients.images._transport
+
+    await clients.close()
+    assert clients._loop is None
+
+
+def test_compact_reviews_dedupes_and_fits_budget():
+    from app.model_service.prompt_compaction import (
+        compact_reviews,
+        estimate_tokens,
+        format_review_line,
+        MAX_REVIEW_CHARS,
+    )
+
+    reviews = [
+        ReviewDTO(author="A", rating=5, text="Очень уютно, вкусный кофе и быстрый wifi"),
+        ReviewDTO(author="B", rating=5, text="очень уютно,  вкусный кофе и быстрый WiFi!"),
+        ReviewDTO(author="C", rating=4, text="Очень уютно, вкусный кофе и быстрый wifi, рекомендую"),
+        ReviewDTO(author="D", rating=1, text="   "),
+        ReviewDTO(author="E", rating=5, text="Супер!"),
+        ReviewDTO(author="F", rating=2, text="Долго ждали заказ " * 100),
+        ReviewDTO(author="G", rating=3, text="Шумно вечером, но десерты хорошие"),
+    ]
+
+    compacted = compact_reviews(reviews, token_budget=10_000)
+    assert [r.author for r in compacted] == ["A", "F", "G"]
+    assert len(compacted[1].text) <= MAX_REVIEW_CHARS + 1
+
+    budget = estimate_tokens(format_review_line(compacted[0])) + 1
+    assert [r.author for r in compact_reviews(reviews, budget)] == ["A"]
+
+    # ISO-дата сокращается до дня, относительная остаётся целиком
+    iso = ReviewDTO(rating=5, date="2024-03-01T10:00:00Z", text="Тихо")
+    relative = ReviewDTO(rating=5, date="2 weeks ago", text="Тихо")
+    assert format_review_line(iso) == "[2024-03-01 | 5★] Тихо"
+    assert format_review_line(relative) == "[2 weeks ago | 5★] Тихо"
+
+
+@pytest.mark.anyio
+async def test_llm_gateway_priority_and_429_backoff(mocker):
+    """Интерактивные запросы обгоняют фоновые, 429 ретраится с паузой."""
+
+    from google.genai.errors import APIError
+    from app.model_service import llm_gateway as gateway_module
+    from app.model_service.llm_gateway import LLMGateway, LLMPriority, llm_priority
+
+    mocker.patch.object(gateway_module, "MIN_BACKOFF_SECONDS", 0.01)
+
+    gateway = LLMGateway(
+        requests_per_minute=6000, burst=5, max_concurrency=1, max_retries=2
+    )
+    order = []
+    release_first = asyncio.Event()
+
+    async def fake_generate(contents, **kwargs):
+        if contents == "first":
+            await release_first.wait()
+        order.append(contents)
+        return contents
+
+    fake_client = mocker.Mock()
+    fake_client.aio.models.generate_content = fake_generate
+
+    first = asyncio.create_task(gateway.generate_content(fake_client, contents="first"))
+    await asyncio.sleep(0.01)
+
+    with llm_priority(LLMPriority.BACKGROUND):
+        background = asyncio.create_task(
+            gateway.generate_content(fake_client, contents="background")
+        )
+    await asyncio.sleep(0.01)
+    interactive = asyncio.create_task(
+        gateway.generate_content(fake_client, contents="interactive")
+    )
+    await asyncio.sleep(0.01)
+
+    metrics = gateway.metrics()
+    assert metrics["lanes"]["background"]["queue_depth"] == 1
+    assert metrics["lanes"]["interactive"]["queue_depth"] == 1
+
+    release_first.set()
+    await asyncio.gather(first, background, interactive)
+    assert order == ["first", "interactive", "background"]
+
+    calls = {"n": 0}
+
+    async def flaky_generate(contents, **kwargs):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise APIError(429, {"error": {"message": "quota", "status": "RESOURCE_EXHAUSTED"}})
+        return "ok"
+
+    fake_client.aio.models.generate_content = flaky_generate
+    assert await gateway.generate_content(fake_client, contents="retry") == "ok"
+
+    metrics = gateway.metrics()
+    assert calls["n"] == 2
+    assert metrics["lanes"]["interactive"]["throttled"] == 1
+    assert metrics["rate_per_minute"] < 6000
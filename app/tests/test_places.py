@@ -1,4 +1,7 @@
+import asyncio
+import json
 import pytest
+from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from httpx import AsyncClient
@@ -149,6 +152,1036 @@ async def test_analyze_place_existing_fresh(
     mock_parser.assert_not_called()
 
 
+@pytest.mark.anyio
+async def test_reanalysis_updates_place_tags_in_bulk(db_session: AsyncSession):
+    """Повторный анализ обновляет набор тегов места, не дублируя строки."""
+
+    from app.services.service_layer import save_place_analysis
+
+    saved_place, _ = await save_place_analysis(
+        db=db_session, place_dto=MOCK_PLACE_DTO, ai_analysis=MOCK_AI_ANALYSIS
+    )
+
+    updated_analysis = MOCK_AI_ANALYSIS.model_copy(
+        update={"tags": ["wifi", "quiet", "quiet"]}
+    )
+    await save_place_analysis(
+        db=db_session, place_dto=MOCK_PLACE_DTO, ai_analysis=updated_analysis
+    )
+
+    stmt = (
+        select(Tag.name, PlaceTag.confidence)
+        .join(PlaceTag, PlaceTag.tag_id == Tag.id)
+        .where(PlaceTag.place_id == saved_place.id)
+    )
+    rows = (await db_session.execute(stmt)).all()
+
+    assert sorted(name for name, _ in rows) == ["quiet", "wifi"]
+    assert all(confidence == 1.0 for _, confidence in rows)
+
+    all_tags = (await db_session.execute(select(Tag.name))).scalars().all()
+    assert sorted(all_tags) == ["cozy", "quiet", "wifi", "work"]
+
+
+@pytest.mark.anyio
+async def test_save_or_update_places_bulk_upsert(db_session: AsyncSession):
+    """Пачка мест сохраняется upsert'ом, source_url без новой ссылки не теряется."""
+
+    from app.modules.place.models import PlaceReview
+    from app.modules.place.repo import PlaceRepo, ReviewRepo
+    from app.modules.place.service import PlaceService
+
+    place_service = PlaceService(PlaceRepo(db_session), ReviewRepo(db_session))
+
+    await place_service.save_or_update_place(MOCK_PLACE_DTO)
+    await db_session.commit()
+
+    nearby_dto = MOCK_PLACE_DTO.model_copy(
+        update={
+            "url": None,
+            "rating": 4.9,
+            "reviews": [ReviewDTO(author="Carol", rating=4.0, text="Nice")],
+        }
+    )
+    other_dto = MOCK_PLACE_DTO.model_copy(
+        update={"place_id": "google_place_id_456", "name": "Other", "url": None}
+    )
+
+    places = await place_service.save_or_update_places([nearby_dto, other_dto])
+    await db_session.commit()
+
+    assert [p.google_place_id for p in places] == [
+        "google_place_id_123",
+        "google_place_id_456",
+    ]
+    assert places[0].google_rating == 4.9
+    assert places[0].source_url == MOCK_PLACE_DTO.url
+    assert "query_place_id=google_place_id_456" in places[1].source_url
+
+    reviews = (
+        await db_session.execute(
+            select(PlaceReview.author_name).where(PlaceReview.place_id == places[0].id)
+        )
+    ).scalars().all()
+    assert sorted(reviews) == ["Alice", "Bob", "Carol"]
+
+
+@pytest.mark.anyio
+async def test_review_sync_dedupes_and_prunes_by_retention(
+    db_session: AsyncSession, mocker
+):
+    """Тот же отзыв с другой датой не дублируется, старые выпадают из окна хранения."""
+
+    from app.modules.place import service as place_service_module
+    from app.modules.place.models import PlaceReview
+    from app.modules.place.repo import PlaceRepo, ReviewRepo
+    from app.modules.place.service import PlaceService
+
+    mocker.patch.object(place_service_module, "REVIEW_RETENTION", 3)
+    place_service = PlaceService(PlaceRepo(db_session), ReviewRepo(db_session))
+
+    places, stats = await place_service.sync_places([MOCK_PLACE_DTO])
+    await db_session.commit()
+    place_id = places[0].id
+    assert stats[MOCK_PLACE_DTO.place_id].created is True
+
+    async def stored_authors():
+        rows = await db_session.execute(
+            select(PlaceReview.author_name).where(PlaceReview.place_id == place_id)
+        )
+        return sorted(rows.scalars().all())
+
+    # Относительная дата сменилась на ISO — это те же отзывы
+    redated_dto = MOCK_PLACE_DTO.model_copy(
+        update={
+            "reviews": [
+                review.model_copy(update={"date": "2024-03-01T10:00:00Z"})
+                for review in MOCK_PLACE_DTO.reviews
+            ]
+        }
+    )
+    _, stats = await place_service.sync_places([redated_dto])
+    assert stats[MOCK_PLACE_DTO.place_id].changed is False
+
+    # Дубликат, оставшийся от старых отпечатков, удаляется
+    db_session.add(
+        PlaceReview(
+            place_id=place_id,
+            author_name="Alice",
+            text="Great wifi!",
+            published_time="2 недели назад",
+        )
+    )
+    await db_session.commit()
+    _, stats = await place_service.sync_places([redated_dto])
+    await db_session.commit()
+    assert stats[MOCK_PLACE_DTO.place_id].model_dump() == {
+        "created": False,
+        "added": 0,
+        "removed": 1,
+    }
+    assert await stored_authors() == ["Alice", "Bob"]
+
+    # Два новых отзыва при окне в 3: из старых остаётся один
+    fresh_dto = MOCK_PLACE_DTO.model_copy(
+        update={
+            "reviews": [
+                ReviewDTO(author="Carol", rating=4.0, text="Nice"),
+                ReviewDTO(author="Dan", rating=5.0, text="Great"),
+            ]
+        }
+    )
+    _, stats = await place_service.sync_places([fresh_dto])
+    await db_session.commit()
+    assert stats[MOCK_PLACE_DTO.place_id].model_dump() == {
+        "created": False,
+        "added": 2,
+        "removed": 1,
+    }
+    assert len(await stored_authors()) == 3
+
+
+@pytest.mark.anyio
+async def test_search_and_parse_places_loads_cached_reviews_in_bulk(
+    db_session: AsyncSession, mocker
+):
+    """Отзывы известных мест берутся из БД одной выборкой, остальные — из API."""
+
+    from app.modules.parsing import pro_mode_parser
+    from app.modules.place.repo import PlaceRepo, ReviewRepo
+    from app.modules.place.service import PlaceService
+
+    place_repo = PlaceRepo(db_session)
+    await PlaceService(place_repo, ReviewRepo(db_session)).save_or_update_place(
+        MOCK_PLACE_DTO
+    )
+    await db_session.commit()
+
+    candidates = [
+        MOCK_PLACE_DTO.model_copy(update={"reviews": [], "url": None}),
+        MOCK_PLACE_DTO.model_copy(
+            update={"place_id": "google_place_id_new", "reviews": [], "url": None}
+        ),
+    ]
+    mocker.patch.object(
+        pro_mode_parser, "find_places_nearby", AsyncMock(return_value=candidates)
+    )
+    enrich = mocker.patch.object(
+        pro_mode_parser,
+        "enrich_place_with_reviews",
+        AsyncMock(return_value=[ReviewDTO(author="Dan", text="Fresh")]),
+    )
+    bulk_lookup = mocker.spy(place_repo, "get_by_google_ids_with_reviews")
+
+    places = await pro_mode_parser.search_and_parse_places(
+        "кофейня", 55.75, 37.61, place_repo
+    )
+
+    bulk_lookup.assert_called_once()
+    enrich.assert_called_once_with("google_place_id_new", max_reviews=3)
+    assert sorted(r.author for r in places[0].reviews) == ["Alice", "Bob"]
+    assert [r.author for r in places[1].reviews] == ["Dan"]
+
+
+@pytest.mark.anyio
+async def test_pro_mode_indexes_places_without_current_vector(
+    db_session: AsyncSession, mocker
+):
+    """В Qdrant попадают места без актуального вектора, а не только изменившиеся."""
+
+    from app.modules.pro_mode import main as pro_mode_main
+    from app.modules.place.repo import PlaceRepo, ReviewRepo
+    from app.modules.place.service import PlaceService
+
+    place_repo = PlaceRepo(db_session)
+    place_service = PlaceService(place_repo, ReviewRepo(db_session))
+
+    # Место сохранено через /place/analyze и ни разу не индексировалось
+    await place_service.save_or_update_place(MOCK_PLACE_DTO)
+    await db_session.commit()
+
+    insert = mocker.patch.object(
+        pro_mode_main, "insert_data_to_qdrant", AsyncMock(return_value=False)
+    )
+
+    async def sync_and_index(dto):
+        places, stats = await place_service.sync_places([dto])
+        await db_session.commit()
+        await pro_mode_main.index_places([dto], places, place_repo, db_session)
+        return stats[dto.place_id]
+
+    stats = await sync_and_index(MOCK_PLACE_DTO)
+    assert stats.changed is False
+    assert insert.await_count == 1
+
+    # Эмбеддинг не удался — место остаётся в очереди на индексацию
+    insert.return_value = True
+    await sync_and_index(MOCK_PLACE_DTO)
+    assert insert.await_count == 2
+
+    await sync_and_index(MOCK_PLACE_DTO)
+    assert insert.await_count == 2
+
+    updated_dto = MOCK_PLACE_DTO.model_copy(
+        update={"reviews": [ReviewDTO(author="Carol", rating=4.0, text="Nice")]}
+    )
+    await sync_and_index(updated_dto)
+    assert insert.await_count == 3
+
+
+@pytest.mark.anyio
+async def test_analyze_place_stale_returns_immediately(
+    authenticated_client: AsyncClient, db_session: AsyncSession, mocker
+):
+    """Устаревший анализ отдаётся сразу, обновление уходит в фон."""
+
+    stale_place = Place(
+        source_url="https://maps.google.com/?q=stale",
+        name="Stale Coffee",
+        google_rating=4.1,
+    )
+    db_session.add(stale_place)
+    await db_session.commit()
+    await db_session.refresh(stale_place)
+
+    db_session.add(
+        AnalysisResult(
+            place_id=stale_place.id,
+            summary={"verdict": "Old", "pros": [], "cons": []},
+            scores={"food": 6, "service": 6, "atmosphere": 6, "value": 6},
+            vibe_score=60,
+            detailed_attributes={},
+            price_level="$$",
+            best_for=[],
+            created_at=datetime.utcnow() - timedelta(days=45),
+        )
+    )
+    await db_session.commit()
+
+    mock_parser = mocker.patch(
+        "app.services.service_analyzator.get_ai_analysis",
+        side_effect=Exception("Parser called unexpectedly!"),
+    )
+    mock_send_task = mocker.patch("app.celery_app.celery.send_task")
+
+    payload = {"url": "https://maps.google.com/?q=stale", "limit": 5}
+    response = await authenticated_client.post("/place/analyze", json=payload)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["is_stale"] is True
+    assert data["ai_analysis"]["vibe_score"] == 60
+    mock_parser.assert_not_called()
+    mock_send_task.assert_called_once_with(
+        "analyze_place_task", args=["https://maps.google.com/?q=stale", 5]
+    )
+
+
+@pytest.mark.anyio
+async def test_analyze_place_url_variant_uses_place_id(
+    authenticated_client: AsyncClient, db_session: AsyncSession, mocker
+):
+    """Другая ссылка на то же место находит анализ по google_place_id."""
+
+    existing_place = Place(
+        google_place_id="0x38836e:0x9f2a1b",
+        source_url="https://maps.app.goo.gl/abc",
+        name="Canonical Coffee",
+        google_rating=4.5,
+    )
+    db_session.add(existing_place)
+    await db_session.commit()
+    await db_session.refresh(existing_place)
+
+    db_session.add(
+        AnalysisResult(
+            place_id=existing_place.id,
+            summary={"verdict": "Ok", "pros": [], "cons": []},
+            scores={"food": 7, "service": 7, "atmosphere": 7, "value": 7},
+            vibe_score=70,
+            detailed_attributes={},
+            price_level="$$",
+            best_for=[],
+        )
+    )
+    await db_session.commit()
+
+    mock_parser = mocker.patch(
+        "app.services.service_analyzator.get_ai_analysis",
+        side_effect=Exception("Parser called unexpectedly!"),
+    )
+
+    payload = {
+        "url": "https://www.google.com/maps/place/Canonical/data=!4m2!3m1!1s0x38836e:0x9f2a1b?hl=en",
+        "limit": 5,
+    }
+    response = await authenticated_client.post("/place/analyze", json=payload)
+
+    assert response.status_code == 200
+    assert response.json()["ai_analysis"]["vibe_score"] == 70
+    mock_parser.assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_analyze_place_concurrent_single_flight(
+    db_session: AsyncSession, mocker
+):
+    """Одновременные запросы на одно место запускают пайплайн один раз."""
+
+    from app.services.service_analyzator import get_or_create_place_analysis
+
+    async def slow_analysis(url: str, limit: int):
+        await asyncio.sleep(0.05)
+        return MOCK_PLACE_DTO, MOCK_AI_ANALYSIS
+
+    mock_parser = mocker.patch(
+        "app.services.service_analyzator.get_ai_analysis",
+        side_effect=slow_analysis,
+    )
+
+    url = "https://maps.google.com/?q=hot_place"
+    results = await asyncio.gather(
+        *[get_or_create_place_analysis(url=url, db=db_session, limit=5) for _ in range(3)]
+    )
+
+    assert mock_parser.call_count == 1
+    assert all(r.ai_analysis.vibe_score == 92 for r in results)
+
+
+@pytest.mark.anyio
+async def test_analysis_local_cache_hit_and_invalidation(mock_redis_global):
+    """Горячий анализ отдаётся из памяти процесса, инвалидация его сбрасывает."""
+
+    from app.services.analysis_cache import (
+        get_cached_analysis,
+        set_cached_analysis,
+        invalidate_analysis,
+    )
+
+    cache_key = "place_analysis:local_hit"
+    response = AIResponseOut(
+        place_info=MOCK_PLACE_INFO_SCHEMA, ai_analysis=MOCK_AI_ANALYSIS
+    )
+
+    await set_cached_analysis(cache_key, response)
+    mock_redis_global.get.reset_mock()
+
+    cached = await get_cached_analysis(cache_key)
+    assert cached.ai_analysis.vibe_score == 92
+    mock_redis_global.get.assert_not_called()
+
+    await invalidate_analysis(cache_key)
+    mock_redis_global.publish.assert_called_once()
+
+    assert await get_cached_analysis(cache_key) is None
+
+
+@pytest.mark.anyio
+async def test_gemini_analysis_reused_for_same_input(redis_store, mocker):
+    """Если вход промпта не изменился, повторного вызова Gemini нет."""
+
+    from app.model_service import model
+
+    mocker.patch.object(model, "download_images", AsyncMock(return_value=[]))
+    gemini_response = mocker.Mock(text=MOCK_AI_ANALYSIS.model_dump_json())
+    mock_generate = mocker.patch.object(
+        model.client.aio.models,
+        "generate_content",
+        AsyncMock(return_value=gemini_response),
+    )
+
+    first = await model.analyze_place_with_gemini(MOCK_PLACE_DTO)
+    second = await model.analyze_place_with_gemini(MOCK_PLACE_DTO)
+
+    assert first == second == MOCK_AI_ANALYSIS
+    assert mock_generate.call_count == 1
+
+    changed_dto = MOCK_PLACE_DTO.model_copy(
+        update={"description": "Теперь с верандой."}
+    )
+    await model.analyze_place_with_gemini(changed_dto)
+    assert mock_generate.call_count == 2
+
+
+@pytest.mark.anyio
+async def test_gemini_batch_analysis_splits_and_falls_back(mocker):
+    """Батч разбирается по местам, пропущенные и невалидные уходят в одиночный анализ."""
+
+    from app.model_service import model
+
+    mocker.patch.object(model, "download_images", AsyncMock(return_value=[]))
+
+    places = [
+        MOCK_PLACE_DTO.model_copy(update={"place_id": f"batch_{i}", "name": f"Place {i}"})
+        for i in range(3)
+    ]
+
+    valid = MOCK_AI_ANALYSIS.model_dump()
+    batch_payload = {
+        "places": [
+            {"place_index": 0, **valid},
+            {"place_index": 1, "summary": valid["summary"]},
+        ]
+    }
+    single_payload = MOCK_AI_ANALYSIS.model_copy(update={"vibe_score": 50})
+
+    async def fake_generate(model, contents, config):
+        if any("=== PLACE" in part for part in contents if isinstance(part, str)):
+            return mocker.Mock(text=json.dumps(batch_payload))
+        return mocker.Mock(text=single_payload.model_dump_json())
+
+    mock_generate = mocker.patch.object(
+        model.client.aio.models, "generate_content", side_effect=fake_generate
+    )
+
+    results = await model.analyze_places_with_gemini_batch(places)
+
+    assert [r.vibe_score for r in results] == [92, 50, 50]
+    assert mock_generate.call_count == 3
+
+
+@pytest.mark.anyio
+async def test_batch_refresh_keeps_old_analysis_when_gemini_fails(mocker):
+    """Заглушка вместо анализа не сохраняется поверх рабочего анализа."""
+
+    from app.model_service.model import _get_empty_analysis
+    from app.celery_app import celery  # noqa: F401 — задачи импортируются через celery_app
+    from app.tasks import analysis_tasks
+
+    failed_dto = MOCK_PLACE_DTO.model_copy(update={"place_id": "google_place_id_456"})
+    mocker.patch.object(
+        analysis_tasks,
+        "get_ai_analyses_batch",
+        AsyncMock(
+            return_value=[
+                (MOCK_PLACE_DTO, MOCK_AI_ANALYSIS),
+                (failed_dto, _get_empty_analysis()),
+            ]
+        ),
+    )
+    save = mocker.patch.object(
+        analysis_tasks, "save_place_analysis", AsyncMock(return_value=(None, None))
+    )
+    invalidate = mocker.patch.object(analysis_tasks, "invalidate_analysis", AsyncMock())
+
+    result = await analysis_tasks._process_batch_analysis_async(["url_ok", "url_failed"], 10)
+
+    assert result == "Updated 1 of 2 places"
+    save.assert_awaited_once()
+    assert save.call_args.kwargs["place_dto"] is MOCK_PLACE_DTO
+    invalidate.assert_awaited_once()
+
+
+@pytest.mark.anyio
+async def test_refresh_outdated_takes_oldest_analyses_first(
+    db_session: AsyncSession, session_factory, mocker
+):
+    from app.celery_app import celery  # noqa: F401 — задачи импортируются через celery_app
+    from app.tasks import periodic_tasks
+
+    for days in [40, 90, 35, 60]:
+        place = Place(source_url=f"https://maps.google.com/?q={days}", name=f"Place {days}")
+        db_session.add(place)
+        await db_session.flush()
+        db_session.add(
+            AnalysisResult(
+                place_id=place.id,
+                summary={"verdict": "Old", "pros": [], "cons": []},
+                scores={"food": 5, "service": 5, "atmosphere": 5, "value": 5},
+                vibe_score=50,
+                detailed_attributes={},
+                price_level="$$",
+                best_for=[],
+                created_at=datetime.utcnow() - timedelta(days=days),
+            )
+        )
+    await db_session.commit()
+
+    mocker.patch.object(periodic_tasks, "AsyncLocalSession", session_factory)
+    mocker.patch.object(periodic_tasks.settings, "analysis_refresh_places_per_run", 2)
+    delay = mocker.patch.object(periodic_tasks.analyze_places_batch_task, "delay")
+
+    await periodic_tasks._find_and_refresh_places()
+
+    delay.assert_called_once_with(
+        ["https://maps.google.com/?q=90", "https://maps.google.com/?q=60"], limit=5
+    )
+
+
+@pytest.mark.anyio
+async def test_fake_llm_backend_returns_schema_valid_answers(mocker):
+    """Заглушка LLM проходит те же разборы, что и ответы Gemini."""
+
+    from google.genai.errors import ClientError
+    from app.model_service import model
+    from app.model_service.llm_backend import FakeLLMClient
+    from app.modules.pro_mode import llm_service
+
+    fake = FakeLLMClient(latency_ms=0, latency_sigma=0, error_rate=0, throttle_rate=0)
+    mocker.patch.object(model, "client", fake)
+    mocker.patch.object(llm_service, "client", fake)
+    mocker.patch.object(model, "download_images", AsyncMock(return_value=[]))
+
+    analysis = await model.analyze_place_with_gemini(MOCK_PLACE_DTO)
+    again = await model.analyze_place_with_gemini(MOCK_PLACE_DTO)
+    assert analysis == again
+    assert analysis.summary.verdict != "Ошибка анализа"
+    assert set(analysis.tags) <= set(model.ALLOWED_TAGS)
+
+    comparison = await model.compare_places_with_gemini(
+        analysis, analysis, "Place 1", "Place 2"
+    )
+    assert comparison.verdict != model.COMPARISON_ERROR_VERDICT
+
+    params = await llm_service.generate_search_params("тихое кафе для работы")
+    assert params.google_search_query == "тихое кафе для работы"
+
+    throttled = FakeLLMClient(latency_ms=0, latency_sigma=0, error_rate=0, throttle_rate=1)
+    with pytest.raises(ClientError):
+        await throttled.aio.models.generate_content(model="fake", contents="hi")
+
+
+@pytest.mark.anyio
+async def test_serpapi_responses_cached_by_normalized_params(redis_store, mocker):
+    """Повторный запрос к SerpApi берётся из Redis, bypass_cache идёт в сеть."""
+
+    from contextlib import asynccontextmanager
+    from app.modules.parsing import serpapi_client
+
+    responses = [{"local_results": [{"title": "Cafe"}]}, {"error": "quota"}]
+    sent_params = []
+
+    @asynccontextmanager
+    async def fake_get(url, params):
+        sent_params.append(params)
+        yield mocker.Mock(status=200, json=AsyncMock(return_value=responses.pop(0)))
+
+    mocker.patch.object(
+        serpapi_client, "http_clients", mocker.Mock(serpapi=mocker.Mock(get=fake_get))
+    )
+
+    params = {"engine": "google_maps", "q": "кофе  рядом", "hl": "ru"}
+    first = await serpapi_client.serpapi_search(params)
+    second = await serpapi_client.serpapi_search(
+        {"hl": "ru", "q": "кофе рядом ", "engine": "google_maps", "api_key": "other"}
+    )
+
+    assert first == second == {"local_results": [{"title": "Cafe"}]}
+    assert len(sent_params) == 1
+    assert "api_key" in sent_params[0]
+
+    (key,) = redis_store
+    assert key.startswith("serpapi:google_maps:")
+    assert redis_store.ttls[key] == serpapi_client.SERPAPI_CACHE_TTLS["google_maps"]
+
+    # Принудительное обновление идёт в сеть, ответ с ошибкой не затирает кеш
+    refreshed = await serpapi_client.serpapi_search(params, bypass_cache=True)
+    assert refreshed == {"error": "quota"}
+    assert len(sent_params) == 2
+    assert await serpapi_client.serpapi_search(params) == first
+
+
+@pytest.mark.anyio
+async def test_short_url_resolution_cached_permanently(
+    mock_redis_global, redis_store, mocker
+):
+    """Короткая ссылка раскрывается один раз: дальше из памяти или Redis без TTL."""
+
+    from contextlib import asynccontextmanager
+    from app.modules.parsing import parser, place_identity
+
+    redirects = {
+        "https://maps.app.goo.gl/abc": "https://www.google.com/maps/place/Cafe/data=!4m2!3m1!1s0x1:0x2",
+        "https://maps.app.goo.gl/consent": "https://consent.google.com/ml?continue=...",
+    }
+    heads = []
+
+    @asynccontextmanager
+    async def fake_head(url, allow_redirects):
+        heads.append(url)
+        yield mocker.Mock(url=redirects[url])
+
+    mocker.patch.object(
+        parser, "http_clients", mocker.Mock(web=mocker.Mock(head=fake_head))
+    )
+
+    short_url = "https://maps.app.goo.gl/abc"
+    redis = mock_redis_global
+    assert await place_identity.canonicalize_place_url(short_url, redis) == "0x1:0x2"
+    assert await place_identity.canonicalize_place_url(short_url, redis) == "0x1:0x2"
+    assert len(heads) == 1
+
+    # Один маппинг ссылка -> data_id, для коротких ссылок без TTL
+    short_key = place_identity.get_place_url_map_key(short_url)
+    assert redis_store[short_key] == "0x1:0x2"
+    assert redis_store.ttls[short_key] is None
+
+    # Другой процесс (пустой LRU) читает маппинг из Redis
+    place_identity.clear_place_url_cache()
+    assert await place_identity.canonicalize_place_url(short_url, redis) == "0x1:0x2"
+    assert len(heads) == 1
+
+    # Редирект без data_id (страница согласия) не запоминается
+    consent_url = "https://maps.app.goo.gl/consent"
+    assert await place_identity.canonicalize_place_url(consent_url, redis) is None
+    assert await place_identity.canonicalize_place_url(consent_url, redis) is None
+    assert heads.count(consent_url) == 2
+    assert place_identity.get_place_url_map_key(consent_url) not in redis_store
+
+    # Обычные вариации ссылки помнятся ограниченное время
+    long_url = "https://maps.google.com/?q=cafe"
+    await place_identity.remember_place_url(long_url, "0x1:0x2", redis)
+    long_key = place_identity.get_place_url_map_key(long_url)
+    assert redis_store[long_key] == "0x1:0x2"
+    assert redis_store.ttls[long_key] == place_identity.PLACE_URL_MAP_TTL
+
+
+@pytest.mark.anyio
+async def test_review_pages_follow_token_until_limit_or_cutoff(mocker):
+    """Отзывы добираются по next_page_token до limit и обрываются на старых."""
+
+    from app.modules.parsing import parser
+
+    def review(day: int) -> dict:
+        return {
+            "user": {"name": f"User {day}"},
+            "rating": 5,
+            "iso_date": f"2024-03-{day:02d}T10:00:00Z",
+            "snippet": f"Review from day {day}",
+        }
+
+    pages = {
+        None: {
+            "place_info": {"title": "Cafe", "rating": 4.5, "reviews": 120},
+            "reviews": [review(d) for d in range(30, 22, -1)],
+            "serpapi_pagination": {"next_page_token": "page-2"},
+        },
+        "page-2": {
+            "reviews": [review(d) for d in range(22, 2, -1)],
+            "serpapi_pagination": {"next_page_token": "page-3"},
+        },
+    }
+    sent_params = []
+
+    async def fake_search(params, bypass_cache=False):
+        sent_params.append(params)
+        return pages[params.get("next_page_token")]
+
+    mocker.patch.object(parser, "serpapi_search", side_effect=fake_search)
+
+    place = await parser.parse_google_reviews(
+        "https://www.google.com/maps/place/data=!1s0x1:0x2", max_reviews=12
+    )
+    assert place.name == "Cafe"
+    assert [r.date[8:10] for r in place.reviews] == [str(d) for d in range(30, 18, -1)]
+    assert len(sent_params) == 2
+    assert sent_params[1]["num"] == 4
+
+    # Отзывы старше отсечки не запрашиваются и не попадают в результат
+    sent_params.clear()
+    cutoff = datetime(2024, 3, 25, tzinfo=parser.timezone.utc)
+    collected = [
+        page.reviews
+        async for page in parser.iter_review_pages("0x1:0x2", 50, newer_than=cutoff)
+    ]
+    assert [len(reviews) for reviews in collected] == [6]
+    assert len(sent_params) == 1
+
+
+@pytest.mark.anyio
+async def test_nearby_search_shares_tile_and_filters_by_exact_distance(mocker):
+    """Соседние пользователи с одинаковым запросом попадают в один тайл."""
+
+    from app.modules.parsing import pro_mode_parser
+
+    far_place = {"title": "Far", "data_id": "0x9:0x9",
+                 "gps_coordinates": {"latitude": 55.9, "longitude": 37.6}}
+    near_place = {"title": "Near", "data_id": "0x1:0x1",
+                  "gps_coordinates": {"latitude": 55.7512, "longitude": 37.6184}}
+    search = mocker.patch.object(
+        pro_mode_parser,
+        "serpapi_search",
+        AsyncMock(return_value={"local_results": [far_place, near_place]}),
+    )
+
+    first = await pro_mode_parser.find_places_nearby("  Кофейня ", 55.7511, 37.6171)
+    second = await pro_mode_parser.find_places_nearby("кофейня", 55.7536, 37.6194)
+
+    (params_a,), (params_b,) = [call.args for call in search.call_args_list]
+    assert params_a == params_b
+    assert params_a["q"] == "кофейня"
+    assert params_a["ll"] == "@55.7525,37.6175,14z"
+
+    # Фильтр 30 км считается от точной точки пользователя, а не от центра тайла
+    first_far = await pro_mode_parser.find_places_nearby("кофейня", 55.6, 37.6171)
+    assert [p.name for p in first] == [p.name for p in second] == ["Far", "Near"]
+    assert [p.name for p in first_far] == ["Near"]
+
+
+@pytest.mark.anyio
+async def test_analyze_batch_streams_ndjson(authenticated_client: AsyncClient, mocker):
+    """Батч отдаёт строку на каждое место, ошибки не роняют весь батч."""
+
+    from fastapi import HTTPException
+    from app.model_service.llm_gateway import LLMPriority, _current_priority
+
+    ok_response = AIResponseOut(
+        place_info=MOCK_PLACE_INFO_SCHEMA, ai_analysis=MOCK_AI_ANALYSIS
+    )
+    priorities = []
+
+    async def fake_analysis(url: str, db, limit: int):
+        priorities.append(_current_priority.get())
+        if "broken" in url:
+            raise HTTPException(status_code=400, detail="Analysis failed: boom")
+        return ok_response
+
+    mocker.patch(
+        "app.services.service_batch.get_or_create_place_analysis",
+        side_effect=fake_analysis,
+    )
+
+    payload = {
+        "urls": [
+            "https://maps.google.com/?q=one",
+            "https://maps.google.com/?q=broken",
+            "https://maps.google.com/?q=two",
+        ],
+        "limit": 5,
+        "concurrency": 2,
+    }
+    response = await authenticated_client.post("/place/analyze/batch", json=payload)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    assert len(lines) == 3
+
+    by_index = {line["index"]: line for line in lines}
+    assert by_index[0]["status"] == "ok"
+    assert by_index[0]["result"]["ai_analysis"]["vibe_score"] == 92
+    assert by_index[1]["status"] == "error"
+    assert "boom" in by_index[1]["detail"]
+    assert by_index[2]["status"] == "ok"
+    assert priorities == [LLMPriority.DEFAULT] * 3
+
+
+@pytest.mark.anyio
+async def test_analyze_stream_sends_place_info_then_fields(
+    authenticated_client: AsyncClient, db_session: AsyncSession, mocker
+):
+    """SSE: сначала place_info, потом поля анализа по мере генерации, в конце result."""
+
+    from app.model_service import model
+
+    mocker.patch(
+        "app.services.service_analyzator.parse_google_reviews",
+        return_value=MOCK_PLACE_DTO,
+        new_callable=AsyncMock,
+    )
+    mocker.patch.object(model, "download_images", AsyncMock(return_value=[]))
+
+    full_json = MOCK_AI_ANALYSIS.model_dump_json()
+    chunks = [full_json[i : i + 40] for i in range(0, len(full_json), 40)]
+
+    async def fake_stream():
+        for chunk in chunks:
+            yield mocker.Mock(text=chunk)
+
+    mocker.patch.object(
+        model.client.aio.models,
+        "generate_content_stream",
+        AsyncMock(side_effect=lambda **kwargs: fake_stream()),
+    )
+
+    response = await authenticated_client.post(
+        "/place/analyze/stream", json={"url": MOCK_PLACE_DTO.url, "limit": 10}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        event_line, data_line = block.split("\n")
+        events.append((event_line[len("event: ") :], json.loads(data_line[len("data: ") :])))
+
+    assert events[0][0] == "place_info"
+    assert events[0][1]["name"] == "Mock Coffee Shop"
+    field_names = [data["name"] for event, data in events if event == "field"]
+    assert field_names[:2] == ["summary", "scores"]
+    assert events[-1][0] == "result"
+    assert events[-1][1]["ai_analysis"]["vibe_score"] == 92
+
+    saved = (
+        await db_session.execute(
+            select(Place).where(Place.google_place_id == MOCK_PLACE_DTO.place_id)
+        )
+    ).scalar_one()
+    assert events[-1][1]["place_info"]["id"] == saved.id
+
+
+@pytest.mark.anyio
+async def test_analyze_stream_single_flight_for_cold_place(session_factory, mocker):
+    """Параллельные стримы одного нового места парсят его один раз; сбой сохранения — error."""
+
+    from app.model_service.model import ANALYSIS_RESULT_FIELD
+    from app.services import service_analyzator
+
+    release_parse = asyncio.Event()
+
+    async def slow_parse(url, limit):
+        await release_parse.wait()
+        return MOCK_PLACE_DTO
+
+    async def fake_gemini(place_dto):
+        yield "summary", MOCK_AI_ANALYSIS.summary
+        yield ANALYSIS_RESULT_FIELD, MOCK_AI_ANALYSIS
+
+    mock_parse = mocker.patch.object(
+        service_analyzator, "parse_google_reviews", AsyncMock(side_effect=slow_parse)
+    )
+    mocker.patch.object(service_analyzator, "stream_place_analysis_with_gemini", fake_gemini)
+
+    async def collect() -> list[str]:
+        return [
+            event.split("\n")[0][len("event: ") :]
+            async for event in service_analyzator.stream_place_analysis(
+                MOCK_PLACE_DTO.url, 10, session_factory
+            )
+        ]
+
+    streams = [asyncio.create_task(collect()) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    release_parse.set()
+    leader, follower = await asyncio.gather(*streams)
+
+    assert mock_parse.await_count == 1
+    assert leader == ["place_info", "field", "result"]
+    assert follower == ["place_info", "result"]
+
+    # Место уже сохранено — отключаем готовый анализ, чтобы снова дойти до пайплайна
+    mocker.patch.object(service_analyzator, "_find_ready_analysis", AsyncMock(return_value=None))
+    mocker.patch.object(service_analyzator, "get_cached_analysis", AsyncMock(return_value=None))
+    mocker.patch.object(
+        service_analyzator,
+        "_store_new_analysis",
+        AsyncMock(side_effect=RuntimeError("db is down")),
+    )
+    assert await collect() == ["place_info", "field", "error"]
+
+
+@pytest.mark.anyio
+async def test_analysis_job_lifecycle(
+    authenticated_client: AsyncClient, db_session: AsyncSession, mocker
+):
+    """Асинхронный режим: 202 с job id, затем статус через polling."""
+
+    from app.modules.parsing.models import ParsingRequest, TaskStatus
+
+    mock_send_task = mocker.patch("app.celery_app.celery.send_task")
+
+    payload = {"url": "https://maps.google.com/?q=job_place", "limit": 5}
+    response = await authenticated_client.post("/place/analyze/jobs", json=payload)
+
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "pending"
+    mock_send_task.assert_called_once_with(
+        "analyze_place_task",
+        args=["https://maps.google.com/?q=job_place", 5],
+        kwargs={"job_id": job["job_id"]},
+    )
+
+    parsing_request = (
+        await db_session.execute(
+            select(ParsingRequest).where(ParsingRequest.id == job["job_id"])
+        )
+    ).scalar_one()
+    parsing_request.status = TaskStatus.FAILED
+    parsing_request.error_message = "SerpApi down"
+    await db_session.commit()
+
+    status_response = await authenticated_client.get(
+        f"/place/analyze/jobs/{job['job_id']}"
+    )
+    assert status_response.status_code == 200
+    assert status_response.json()["status"] == "failed"
+    assert status_response.json()["error_message"] == "SerpApi down"
+
+    missing = await authenticated_client.get("/place/analyze/jobs/999999")
+    assert missing.status_code == 404
+
+    # Чужую задачу не видно, даже зная её id
+    from app.modules.user.models import User
+    from app.security import create_access_token, hash_password
+
+    other_user = User(
+        email="other@example.com",
+        first_name="Other",
+        last_name="User",
+        hashed_password=hash_password("other_password"),
+        role="USER",
+    )
+    db_session.add(other_user)
+    await db_session.commit()
+
+    owner_auth = authenticated_client.headers["Authorization"]
+    authenticated_client.headers["Authorization"] = (
+        f"Bearer {create_access_token({'sub': other_user.email})}"
+    )
+    foreign = await authenticated_client.get(f"/place/analyze/jobs/{job['job_id']}")
+    assert foreign.status_code == 404
+    authenticated_client.headers["Authorization"] = owner_auth
+
+    # Свежий анализ уже есть — отдаётся сразу, без задачи в очереди
+    mock_send_task.reset_mock()
+    mocker.patch(
+        "app.services.service_jobs.get_ready_place_analysis",
+        AsyncMock(
+            return_value=AIResponseOut(
+                place_info=MOCK_PLACE_INFO_SCHEMA, ai_analysis=MOCK_AI_ANALYSIS
+            )
+        ),
+    )
+    ready = await authenticated_client.post("/place/analyze/jobs", json=payload)
+    assert ready.status_code == 200
+    assert ready.json()["status"] == "completed"
+    assert ready.json()["job_id"] is None
+    assert ready.json()["result"]["ai_analysis"]["vibe_score"] == MOCK_AI_ANALYSIS.vibe_score
+    mock_send_task.assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_analysis_job_worker_transitions(
+    db_session: AsyncSession, session_factory, test_user, mock_redis_global, mocker
+):
+    """Воркер ведёт задачу pending -> processing -> completed/failed и зеркалит в Redis."""
+
+    from app.modules.parsing.models import TaskStatus
+    from app.modules.parsing.repo import ParsingRequestRepo
+    from app.modules.parsing.service import ParsingJobService, get_job_cache_key
+    from app.model_service.model import _get_empty_analysis
+    from app.celery_app import celery  # noqa: F401 — задачи импортируются через celery_app
+    from app.tasks import analysis_tasks
+
+    mocker.patch.object(analysis_tasks, "AsyncLocalSession", session_factory)
+    mocker.patch.object(analysis_tasks, "get_redis_client", return_value=mock_redis_global)
+    mocker.patch.object(analysis_tasks, "invalidate_analysis", AsyncMock())
+    mock_analysis = mocker.patch.object(
+        analysis_tasks,
+        "get_ai_analysis",
+        AsyncMock(return_value=(MOCK_PLACE_DTO, MOCK_AI_ANALYSIS)),
+    )
+
+    job_service = ParsingJobService(ParsingRequestRepo(db_session), mock_redis_global)
+    user_id = test_user.id
+
+    def mirrored_statuses(job_id: int) -> list[str]:
+        return [
+            json.loads(call.args[1])["job"]["status"]
+            for call in mock_redis_global.set.call_args_list
+            if call.args[0] == get_job_cache_key(job_id)
+        ]
+
+    async def db_job(job_id: int):
+        db_session.expire_all()
+        return await job_service.get_job(job_id, user_id)
+
+    job = await job_service.create_job(user_id)
+    await analysis_tasks._process_analysis_async("url", 10, job_id=job.job_id)
+
+    completed = await db_job(job.job_id)
+    assert completed.status == TaskStatus.COMPLETED
+    assert completed.place_id is not None
+    assert mirrored_statuses(job.job_id) == ["pending", "processing", "completed"]
+
+    # Повторный анализ того же места не отнимает результат у прошлой задачи
+    repeat = await job_service.create_job(user_id)
+    await analysis_tasks._process_analysis_async("url", 10, job_id=repeat.job_id)
+
+    assert (await db_job(repeat.job_id)).place_id == completed.place_id
+    assert (await db_job(job.job_id)).place_id == completed.place_id
+
+    # Ссылка не распарсилась — задача падает, пустое место не сохраняется
+    for place_dto, analysis in [
+        (MOCK_PLACE_DTO.model_copy(update={"place_id": ""}), _get_empty_analysis()),
+        (MOCK_PLACE_DTO, _get_empty_analysis()),
+    ]:
+        mock_analysis.return_value = (place_dto, analysis)
+        job = await job_service.create_job(user_id)
+        await analysis_tasks._process_analysis_async("url", 10, job_id=job.job_id)
+
+        failed = await db_job(job.job_id)
+        assert failed.status == TaskStatus.FAILED
+        assert failed.error_message
+        assert mirrored_statuses(job.job_id) == ["pending", "processing", "failed"]
+
+    places = (await db_session.execute(select(Place.google_place_id))).scalars().all()
+    assert places == [MOCK_PLACE_DTO.place_id]
+
+
 @pytest.mark.anyio
 async def test_compare_places(authenticated_client: AsyncClient, mocker):
 
@@ -182,6 +1215,54 @@ async def test_compare_places(authenticated_client: AsyncClient, mocker):
     assert data["place_a"]["name"] == "Mock Coffee Shop"
 
 
+@pytest.mark.anyio
+async def test_compare_places_cached_by_ordered_pair(redis_store, mocker):
+    """Повторное сравнение пары берётся из кеша, обратный порядок — отдельная запись."""
+
+    from app.services.service_comparator import compare_places_service
+
+    analyzed_at = datetime(2026, 1, 1)
+    responses = {
+        url: AIResponseOut(
+            place_info=MOCK_PLACE_INFO_SCHEMA.model_copy(
+                update={"google_place_id": f"gid_{url}", "name": f"Place {url}"}
+            ),
+            ai_analysis=MOCK_AI_ANALYSIS,
+            analyzed_at=analyzed_at,
+        )
+        for url in ("a", "b")
+    }
+
+    async def fake_analysis(url, limit, db):
+        return responses[url]
+
+    mocker.patch(
+        "app.services.service_comparator.get_or_create_place_analysis",
+        side_effect=fake_analysis,
+    )
+    mock_compare = mocker.patch(
+        "app.services.service_comparator.compare_places_with_gemini",
+        return_value=MOCK_COMPARISON,
+        new_callable=AsyncMock,
+    )
+
+    first = await compare_places_service("a", "b", limit=10, db=None)
+    again = await compare_places_service("a", "b", limit=10, db=None)
+    swapped = await compare_places_service("b", "a", limit=10, db=None)
+
+    assert again.comparison == first.comparison
+    assert swapped.place_a.name == "Place b"
+    # Текстовый verdict ссылается на стороны A/B — обратный порядок сравнивается заново
+    assert mock_compare.await_count == 2
+    assert mock_compare.call_args.kwargs["name_a"] == "Place b"
+
+    responses["b"] = responses["b"].model_copy(
+        update={"analyzed_at": analyzed_at + timedelta(days=30)}
+    )
+    await compare_places_service("a", "b", limit=10, db=None)
+    assert mock_compare.await_count == 3
+
+
 @pytest.mark.anyio
 async def test_pro_analyze_vector_search(authenticated_client: AsyncClient, mocker):
 
@@ -0,0 +1,3 @@
+-- Владелец задачи анализа: GET /place/analyze/jobs/{job_id} отдаёт задачу только ему
+ALTER TABLE parsing_requests ADD COLUMN IF NOT EXISTS user_id INTEGER REFERENCES users(id);
+CREATE INDEX IF NOT EXISTS ix_parsing_requests_user_id ON parsing_requests (user_id);
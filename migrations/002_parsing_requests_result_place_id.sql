@@ -0,0 +1,3 @@
+-- Место, проанализированное задачей; не уникально, в отличие от place_id
+ALTER TABLE parsing_requests ADD COLUMN IF NOT EXISTS result_place_id INTEGER REFERENCES places(id);
+CREATE INDEX IF NOT EXISTS ix_parsing_requests_result_place_id ON parsing_requests (result_place_id);
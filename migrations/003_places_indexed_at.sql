@@ -0,0 +1,2 @@
+-- Когда место последний раз индексировалось в Qdrant; NULL — вектор устарел
+ALTER TABLE places ADD COLUMN IF NOT EXISTS indexed_at TIMESTAMP WITHOUT TIME ZONE;